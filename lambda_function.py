@@ -7,12 +7,8 @@ import sys
 # Adicionar o diretório atual ao path
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
-from mangum import Mangum
-from src.api.main import app
-
-# Handler para Lambda
-handler = Mangum(app, lifespan="off")
+from src.api.main import handler
 
 def lambda_handler(event, context):
-    """AWS Lambda handler function"""
+    """AWS Lambda handler function (HTTP via Mangum; evento agendado do EventBridge gera snapshot)"""
     return handler(event, context)
\ No newline at end of file
@@ -11,17 +11,35 @@ from mangum import Mangum
 from datetime import datetime
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
 
 from src.api.payload.request.relatorio_cliente import ClienteRelatorioPayload
 from src.services.carteiras.make_report import build_report_from_payload
 from src.services.carteiras.assembleia_report import build_report_assembleia_from_payload
 from src.services.s3.aws_s3_service import generate_temporary_url, upload_bytes_to_s3
 from src.services.carteiras.assembleia.constants import NOME_RELATORIO_ASSEMBLEIA, BUCKET_RELATORIOS
+from src.services.carteiras.fmp.client import get_fmp_client
+from src.services.carteiras.circuit import breaker_stats
+from src.services.carteiras.negative_cache import get_negative_cache
+from src.services.carteiras.snapshot import (
+    SnapshotNotFound, build_snapshot, get_snapshot, list_snapshots,
+    start_snapshot_scheduler, stop_snapshot_scheduler,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Portfolio API", version="1.4.0")
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    # Servidor (uvicorn/EC2): snapshots periódicos se SNAPSHOT_SCHEDULE_SECONDS > 0.
+    # No Lambda o lifespan fica desligado e o agendamento vem do EventBridge (handler).
+    if os.getenv("FMP_API_KEY"):
+        start_snapshot_scheduler()
+    yield
+    stop_snapshot_scheduler()
+
+app = FastAPI(title="Portfolio API", version="1.4.0", lifespan=_lifespan)
 XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
 # Thread pool para tarefas CPU-bound
@@ -42,17 +60,72 @@ report_cache: Dict[str, Dict[str, Any]] = {}
 def health_check():
     return {"status": "healthy", "message": "API v1.4.1 - Optimized"}
 
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Contadores do cache/coalescência/cota da FMP e estado dos circuit breakers."""
+    fmp = get_fmp_client()
+    return {"fmp": fmp.cache.stats(), "fmp_inflight": fmp.inflight.stats(),
+            "fmp_quota": fmp.limiter.stats(), "circuits": breaker_stats()}
+
+@app.get("/admin/negative-cache")
+def list_negative_cache():
+    """Lista (tipo, símbolo) marcados como sem dado e até quando valem."""
+    nc = get_negative_cache()
+    entries = nc.entries()
+    return {"count": len(entries), "hits": nc.hits, "entries": entries}
+
+@app.delete("/admin/negative-cache")
+def clear_negative_cache(kind: str | None = None, symbol: str | None = None):
+    """Limpa o negative cache (tudo, ou filtrando por tipo e/ou símbolo)."""
+    return {"cleared": get_negative_cache().clear(kind=kind, symbol=symbol)}
+
+
+# === Snapshots de mercado ===
+def _require_snapshot(snapshot_id: str | None) -> str | None:
+    """Resolve o snapshot pedido (404 se não existir); None = dados ao vivo."""
+    if not snapshot_id:
+        return None
+    try:
+        return get_snapshot(snapshot_id).snapshot_id
+    except SnapshotNotFound as e:
+        raise HTTPException(404, str(e))
+
+def _build_snapshot_safe():
+    try:
+        build_snapshot()
+    except Exception as e:
+        logger.error(f"Erro ao construir snapshot: {e}")
+
+@app.post("/snapshots")
+async def create_snapshot(background_tasks: BackgroundTasks):
+    """Pré-busca o universo (notes.json) em background e grava um snapshot novo."""
+    if not os.getenv("FMP_API_KEY"):
+        raise HTTPException(400, "Variáveis faltando: FMP_API_KEY")
+    background_tasks.add_task(_build_snapshot_safe)
+    return {"message": "Snapshot em processamento", "status": "processing"}
+
+@app.get("/snapshots")
+def get_snapshots():
+    ids = list_snapshots()
+    return {"snapshots": ids, "latest": ids[-1] if ids else None}
+
+@app.get("/snapshots/{snapshot_id}")
+def get_snapshot_summary(snapshot_id: str):
+    try:
+        return get_snapshot(snapshot_id).summary()
+    except SnapshotNotFound as e:
+        raise HTTPException(404, str(e))
+
 
 # === Assembleia ===
-async def _generate_and_upload_assembleia(payload: Dict[str, Any], symbol: str | None):
+async def _generate_and_upload_assembleia(payload: Dict[str, Any], symbol: str | None,
+                                          snapshot_id: str | None = None):
     """Função assíncrona para gerar relatório em background"""
     try:
         loop = asyncio.get_event_loop()
         buf = await loop.run_in_executor(
             executor,
-            build_report_assembleia_from_payload,
-            payload,
-            symbol
+            partial(build_report_assembleia_from_payload, payload, symbol, snapshot_id=snapshot_id),
         )
         if buf:
             await loop.run_in_executor(
@@ -71,16 +144,18 @@ async def _generate_and_upload_assembleia(payload: Dict[str, Any], symbol: str |
 @app.post("/generate-report/assembleia")
 async def generate_assembleia_post(
     payload: Dict[str, Any],
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    snapshot_id: str | None = None,
 ):
-    """POST: Inicia geração em background"""
+    """POST: Inicia geração em background (snapshot_id: "latest" ou id de um snapshot)"""
     required_envs = ["FMP_API_KEY", "AWS_KEY", "AWS_SECRET"]
     missing = [e for e in required_envs if not os.getenv(e)]
     if missing:
         raise HTTPException(400, f"Variáveis faltando: {', '.join(missing)}")
     
+    snapshot_id = _require_snapshot(snapshot_id)
     symbol = payload.get("symbol")
-    background_tasks.add_task(_generate_and_upload_assembleia, payload, symbol)
+    background_tasks.add_task(_generate_and_upload_assembleia, payload, symbol, snapshot_id)
     
     return {"message": "Relatório assembleia em processamento", "status": "processing"}
 
@@ -103,14 +178,14 @@ def download_assembleia():
 
 # === Relatório Genérico ===
 @app.post("/generate-report")
-async def generate_generic_report(payload: ClienteRelatorioPayload):
-    """Relatório genérico síncrono (rápido)"""
+async def generate_generic_report(payload: ClienteRelatorioPayload, snapshot_id: str | None = None):
+    """Relatório genérico síncrono (rápido); snapshot_id: "latest" ou id de um snapshot"""
+    snapshot_id = _require_snapshot(snapshot_id)
     try:
         loop = asyncio.get_event_loop()
         buf = await loop.run_in_executor(
             executor,
-            build_report_from_payload,
-            payload.dict()
+            partial(build_report_from_payload, payload.dict(), snapshot_id=snapshot_id),
         )
         
         # Retorna PDF diretamente
@@ -127,4 +202,11 @@ async def generate_generic_report(payload: ClienteRelatorioPayload):
 
 
 # Lambda handler
-handler = Mangum(app, lifespan="off")
\ No newline at end of file
+_asgi_handler = Mangum(app, lifespan="off")
+
+def handler(event, context):
+    """HTTP via Mangum; evento agendado (EventBridge) constrói um snapshot de mercado."""
+    if isinstance(event, dict) and event.get("source") == "aws.events":
+        snap = build_snapshot()
+        return snap.summary()
+    return _asgi_handler(event, context)
\ No newline at end of file
@@ -11,4 +11,48 @@ class Settings:
     ANTIFRAGILE_MULTIPLIER = 1.03
     WEEKLY_GROUPING_DAYS = 5
 
-settings = Settings()
\ No newline at end of file
+    # Cliente HTTP compartilhado da FMP (pool de conexões + retry)
+    FMP_BASE_URL = os.getenv("FMP_BASE_URL", "https://financialmodelingprep.com")
+    FMP_POOL_SIZE = int(os.getenv("FMP_POOL_SIZE", "16"))
+    FMP_RETRIES = int(os.getenv("FMP_RETRIES", "2"))
+    FMP_BACKOFF = float(os.getenv("FMP_BACKOFF", "0.5"))
+    # Cache em memória das respostas da FMP (TTL por endpoint, LRU)
+    FMP_CACHE_ENABLED = os.getenv("FMP_CACHE_ENABLED", "1") not in ("0", "false", "False")
+    FMP_CACHE_SIZE = int(os.getenv("FMP_CACHE_SIZE", "4096"))
+    # Cota do plano FMP (token bucket compartilhado pelo processo)
+    FMP_CALLS_PER_MINUTE = int(os.getenv("FMP_CALLS_PER_MINUTE", "300"))
+    FMP_RATE_BURST = int(os.getenv("FMP_RATE_BURST", "10"))
+    FMP_RATE_MAX_WAIT = float(os.getenv("FMP_RATE_MAX_WAIT", "60"))
+
+    # Máximo de símbolos buscados em paralelo por relatório
+    REPORT_FETCH_CONCURRENCY = int(os.getenv("REPORT_FETCH_CONCURRENCY", "8"))
+
+    # Preço spot de cripto: fonte seguinte entra após este atraso (s); 0 = todas em paralelo
+    CRYPTO_PRICE_HEDGE_DELAY = float(os.getenv("CRYPTO_PRICE_HEDGE_DELAY", "0.75"))
+
+    # Circuit breakers dos provedores de fallback (yfinance, CoinGecko, tradutores)
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+    CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "120"))
+
+    # Consultas vazias (símbolo sem perfil/dividendo/alvo/dado no Yahoo) lembradas por este TTL (s)
+    NEGATIVE_CACHE_TTL_SECONDS = float(os.getenv("NEGATIVE_CACHE_TTL_SECONDS", "43200"))
+
+    # Dados persistidos entre reinícios (store de preços, snapshots).
+    # Fora do tempdir: ele é limpo no reboot e não é compartilhado entre workers.
+    DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.expanduser("~"), ".cache", "bella-relatorios"))
+
+    # Histórico diário persistido (SQLite). Vazio desabilita.
+    PRICE_STORE_PATH = os.getenv("PRICE_STORE_PATH", os.path.join(DATA_DIR, "price-history.sqlite3"))
+    # Fim da janela (barra do dia, fds/feriado sem barra) é rebuscado no máximo a cada intervalo (s)
+    PRICE_STORE_REFRESH_SECONDS = int(os.getenv("PRICE_STORE_REFRESH_SECONDS", "900"))
+
+    # Snapshots de mercado (universo pré-buscado servindo vários relatórios).
+    # O diretório é criado só p/ o usuário do processo.
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(DATA_DIR, "snapshots"))
+    SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+    # Intervalo (s) do agendador de snapshots no servidor (uvicorn); 0 desliga
+    SNAPSHOT_SCHEDULE_SECONDS = float(os.getenv("SNAPSHOT_SCHEDULE_SECONDS", "0"))
+    # Tickers separados por vírgula; vazio = notes.json da assembleia
+    SNAPSHOT_UNIVERSE = os.getenv("SNAPSHOT_UNIVERSE", "")
+
+settings = Settings()
@@ -13,7 +13,7 @@ from reportlab.lib.colors import white, black
 
 # Páginas estáticas (capas, perfis, índices, etc.)
 from .pages_static import (
-    onpage_capa, onpage_grafico_juros, onpage_noticias,
+    onpage_capa, onpage_grafico_juros, onpage_noticias_factory,
     onpage_perfil_cons, onpage_perfil_mod, onpage_perfil_arj, onpage_perfil_opp,
     onpage_etfs_cons, onpage_etfs_mod, onpage_etfs_arr,
     onpage_acao_mod, onpage_acao_arr,
@@ -30,6 +30,8 @@ from .pages_news import draw_news_page
 from .pages_monthly import draw_monthly_cards_page
 from .pages_text_asset import draw_text_asset_page
 from .constants import img_path, ETF_PAGE_BG_IMG, NEWS_PAGE_BG_IMG
+from ..trading_calendar import get_calendar
+from ..snapshot import CRYPTO_ALIASES
 
 from datetime import datetime
 try:
@@ -233,6 +235,8 @@ def generate_assembleia_report(
     custom_range_pages: list | None = None,   
     text_assets: list | None = None,
     fetch_price_fn=None, 
+    custom_range_prices: dict | None = None,   # {(símbolo, data): preço} já resolvido
+    render_data: dict | None = None,           # notícias/traduções/imagens (render_prefetch)
     
     
     
@@ -254,6 +258,15 @@ def generate_assembleia_report(
     monthly_label  = (monthly_label or "").strip()
     custom_range_pages = custom_range_pages or []
     text_assets = text_assets or []
+
+    # ---------- Dados de rede resolvidos ANTES do render (onPage só lê) ----------
+    if render_data is None:
+        from .render_prefetch import prefetch_render_data
+        render_data = prefetch_render_data(
+            [etfs_cons, etfs_mod, etfs_agr, stocks_mod, stocks_arj, stocks_opp,
+             reits_cons, smallcaps_arj, crypto, hedge]
+        )
+    asset_news = render_data.get("asset_news") or {}
     
     # ---------- Doc/Frame básicos ----------
     buffer = BytesIO()
@@ -629,7 +642,8 @@ def generate_assembleia_report(
 
         def _onpage(c: Canvas, _doc):
             if state["i"] < len(items):
-                draw_news_page(c, items[state["i"]])
+                sym = (items[state["i"]].get("symbol") or "").strip().upper()
+                draw_news_page(c, items[state["i"]], articles=asset_news.get(sym))
                 draw_back_to_index_button(c)
                 state["i"] += 1
             else:
@@ -694,40 +708,59 @@ def generate_assembleia_report(
         monthly_templates.append(template)
         print(f"[DEBUG] Criado template {template_id} para página {i}")
         
+    crypto_symbols = {(c.get("symbol") or "").strip().upper() for c in crypto} | set(CRYPTO_ALIASES)
+
+    def _is_crypto(symbol: str) -> bool:
+        sym = (symbol or "").strip().upper()
+        return sym in crypto_symbols or sym.endswith("-USD")
+
     def _fetch_latest_or_same(symbol: str, ref_date: date, lookback: int = 7):
         """
-        Tenta pegar o preço em ref_date; se None/0, volta até 'lookback' dias.
-        Usa 'fetch_price_fn' se houver; caso contrário tenta importar o fetch default.
+        Preço no último pregão <= ref_date; se None/0, volta pregão a pregão até
+        'lookback' dias (calendário NYSE p/ equities/ETFs: fds/feriados não geram
+        consulta; cripto negocia 24/7 e usa todos os dias).
+        Usa 'fetch_price_fn' se houver; caso contrário, o lookup em intervalo do assembleia_report.
         """
-        # escolhe a base de busca
-        base_fetch = fetch_price_fn
-        if base_fetch is None:
-            try:
-                # fallback: usa o fetch padrão se o caller não passou nada
-                from ..assembleia_report import _fetch_close_price as base_fetch
-            except Exception:
-                base_fetch = None
-
-        d = ref_date
-        for _ in range(lookback + 1):
-            p = base_fetch(symbol, d) if base_fetch else None
+        if fetch_price_fn is None:
+            from ..assembleia_report import _find_last_available_close
+            return _find_last_available_close(symbol, ref_date, max_lookback=lookback,
+                                              crypto=_is_crypto(symbol))
+
+        cal = get_calendar(crypto=_is_crypto(symbol))
+        floor = ref_date - timedelta(days=lookback)
+        d = cal.last_session(ref_date)
+        while d >= floor:
+            p = fetch_price_fn(symbol, d)
             if p not in (None, 0):
                 return p, d
-            d -= timedelta(days=1)
+            d = cal.previous_session(d)
         return None, None
                
-    def custom_range_onpage_factory(items: list, fetch_price_fn):
+    def _prefetch_custom_range(items: list) -> dict:
+        """Resolve os preços do intervalo customizado antes do doc.build (em paralelo)."""
+        from ..assembleia_report import _parse_front_date, prefetch_custom_range_prices
+        from ..concurrency import map_bounded
+        if fetch_price_fn is None:
+            return prefetch_custom_range_prices(items)
+        today = date.today()
+        keys = list(dict.fromkeys(
+            ((it.get("symbol") or "").strip().upper(), d)
+            for it in items
+            for d in (_parse_front_date(it.get("start_date")), _parse_front_date(it.get("end_date")), today)
+            if d and (it.get("symbol") or "").strip()
+        ))
+        prices = map_bounded(lambda k: _fetch_latest_or_same(*k)[0], keys)
+        return dict(zip(keys, prices))
+
+    def custom_range_onpage_factory(items: list, prices: dict):
         def _onpage(c, _doc):
             if items:
                 from .pages_monthly import draw_custom_range_page_many
 
-                def fetch_with_fallback(sym, dt):
-                    price, _ = _fetch_latest_or_same(sym, dt)
-                    return price
-
+                # só leitura: nenhum acesso à rede durante o render
                 draw_custom_range_page_many(
                     c, items,
-                    fetch_price_fn=fetch_with_fallback,
+                    fetch_price_fn=lambda sym, dt: prices.get((sym, dt)),
                     title="ATIVOS INDICADOS COM ENTRADA E SAÍDA",
                 )
             else:
@@ -742,7 +775,10 @@ def generate_assembleia_report(
         custom_range_t = PageTemplate(
             id="CUSTOM_RANGE", 
             frames=[frame], 
-            onPage=custom_range_onpage_factory(custom_range_pages, fetch_price_fn)
+            onPage=custom_range_onpage_factory(
+                custom_range_pages,
+                custom_range_prices if custom_range_prices is not None else _prefetch_custom_range(custom_range_pages),
+            )
         )
         custom_range_templates.append(custom_range_t)
         
@@ -781,7 +817,7 @@ def generate_assembleia_report(
     cover_t      = PageTemplate(id="Capa",                frames=[frame], onPage=onpage_capa_with_date)
     alocacao_t   = PageTemplate(id="ALOCACAO",            frames=[frame], onPage=onpage_allocacao_perfis)
     toc_t        = PageTemplate(id="TOC",                 frames=[frame], onPage=onpage_toc_factory(toc_data))
-    news_t       = PageTemplate(id="Noticias",            frames=[frame], onPage=onpage_noticias)
+    news_t       = PageTemplate(id="Noticias",            frames=[frame], onPage=onpage_noticias_factory(render_data.get("market_news") or []))
     perfilcons_t = PageTemplate(id="PerfilConservador",   frames=[frame], onPage=onpage_perfil_cons)
     perfilmod_t  = PageTemplate(id="PerfilModerado",      frames=[frame], onPage=onpage_perfil_mod)
     perfilarj_t  = PageTemplate(id="PerfilArrojado",      frames=[frame], onPage=onpage_perfil_arj)
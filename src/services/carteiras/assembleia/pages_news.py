@@ -1,28 +1,22 @@
-import os
-import requests
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.lib.pagesizes import A4
 
 from .constants import img_path, NEWS_PAGE_BG_IMG, NEWS_SPEC
 from .utils import (
     draw_image_cover,
-    normalize_asset_minimal,
     wrap_and_draw,
     dedupe_sentences,
-    translate_en_to_pt,   # ← IMPORTAR
 )
+from ..concurrency import map_bounded
+from ..fmp.client import get_fmp_client
 
 # -------------------------------------------------
 # Fetchers / Normalização
 # -------------------------------------------------
 
 def get_fmp_key() -> str:
-    v = (os.getenv("FMP_API_KEY") or "").strip()     # remove espaços/linhas
-    v = v.replace("\r", "").replace("\n", "")        # remove quebras
-    # Se o .env estiver errado e a variável vier como "FMP_API_KEY=xxxx"
-    if "FMP_API_KEY=" in v:
-        v = v.split("=", 1)[1]
-    return v
+    # remove espaços/quebras e o prefixo "FMP_API_KEY=" se o .env vier errado
+    return get_fmp_client().api_key
 
 def _norm_news_item(d: dict) -> dict:
     """Normaliza item de notícia vindo de /general_news ou /stock_news."""
@@ -39,15 +33,64 @@ def fetch_asset_news(api_key: str, symbol: str, limit: int = 2):
     if not (api_key and symbol):
         return []
     try:
-        url = f"https://financialmodelingprep.com/api/v3/stock_news?tickers={symbol.upper()}&limit={limit}&apikey={api_key}"
-        r = requests.get(url, timeout=12)
-        r.raise_for_status()
-        data = r.json() or []
+        data = get_fmp_client().get_json(
+            "api/v3/stock_news",
+            {"tickers": symbol.upper(), "limit": limit, "apikey": api_key},
+        ) or []
         return [_norm_news_item(x) for x in data[:limit]]
     except Exception as e:
         print(f"[NEWS] {symbol}: {e}")
         return []
 
+# stock_news com vários tickers devolve as mais recentes do lote inteiro (limit total),
+# então o limit do lote folga p/ tickers com muito volume não esconderem os demais.
+NEWS_CHUNK_SIZE = 10
+NEWS_BATCH_LIMIT_FACTOR = 5
+
+def fetch_asset_news_batch(api_key: str, symbols, limit: int = 2,
+                           chunk_size: int = NEWS_CHUNK_SIZE) -> dict[str, list[dict]]:
+    """
+    Notícias de vários tickers em poucas chamadas stock_news (lotes de `chunk_size`),
+    repartidas por símbolo, as `limit` mais recentes de cada. Só os tickers que
+    voltarem vazios (ou de lotes que falharam) caem na busca individual.
+    Retorna {SÍMBOLO: [itens normalizados]}.
+    """
+    syms = list(dict.fromkeys(s for s in ((x or "").strip().upper() for x in symbols) if s))
+    if not (api_key and syms):
+        return {s: [] for s in syms}
+    fmp = get_fmp_client()
+    size = max(1, chunk_size)
+    chunks = [syms[i:i + size] for i in range(0, len(syms), size)]
+
+    def _fetch_chunk(chunk: list[str]) -> list[dict]:
+        try:
+            data = fmp.get_json(
+                "api/v3/stock_news",
+                {"tickers": ",".join(chunk), "limit": len(chunk) * limit * NEWS_BATCH_LIMIT_FACTOR,
+                 "apikey": api_key},
+            ) or []
+            return data if isinstance(data, list) else []
+        except Exception as e:
+            print(f"[NEWS] lote {chunk[0]}..({len(chunk)}): {e}")
+            return []
+
+    grouped: dict[str, list[dict]] = {s: [] for s in syms}
+    for data in map_bounded(_fetch_chunk, chunks):
+        for row in data:
+            sym = (row.get("symbol") or "").strip().upper()
+            if sym in grouped:
+                grouped[sym].append(row)
+    out = {
+        s: [_norm_news_item(x) for x in sorted(rows, key=lambda r: r.get("publishedDate") or "", reverse=True)[:limit]]
+        for s, rows in grouped.items()
+    }
+
+    missing = [s for s, arts in out.items() if not arts]
+    if missing:
+        print(f"[NEWS] {len(syms) - len(missing)}/{len(syms)} tickers no lote; fallback individual p/ {len(missing)}")
+        out.update(zip(missing, map_bounded(lambda s: fetch_asset_news(api_key, s, limit=limit), missing)))
+    return out
+
 def fetch_general_market_news(api_key: str | None, limit: int = 3):
     """
     Tenta em:
@@ -59,24 +102,22 @@ def fetch_general_market_news(api_key: str | None, limit: int = 3):
         print("[NEWS] FMP_API_KEY ausente.")
         return []
 
-    base = "https://financialmodelingprep.com"
     endpoints = [
-        f"{base}/api/v3/general_news?limit={limit}&apikey={api_key}",
-        f"{base}/api/v3/stock_news?tickers=SPY,QQQ,DIA,GLD&limit={limit}&apikey={api_key}",
-        f"{base}/api/v3/stock_news?limit={limit}&apikey={api_key}",
+        ("api/v3/general_news", {"limit": limit}),
+        ("api/v3/stock_news", {"tickers": "SPY,QQQ,DIA,GLD", "limit": limit}),
+        ("api/v3/stock_news", {"limit": limit}),
     ]
 
-    for url in endpoints:
+    fmp = get_fmp_client()
+    for path, params in endpoints:
         try:
-            r = requests.get(url, timeout=12)
-            r.raise_for_status()
-            data = r.json() or []
+            data = fmp.get_json(path, {**params, "apikey": api_key}) or []
             if isinstance(data, list) and data:
                 items = [_norm_news_item(x) for x in data[:limit]]
-                print(f"[NEWS] {len(items)} itens obtidos de {url.split('/api/')[1]}")
+                print(f"[NEWS] {len(items)} itens obtidos de {path}")
                 return items
         except Exception as e:
-            print(f"[NEWS] falha em {url}: {e}")
+            print(f"[NEWS] falha em {path}: {e}")
 
     print("[NEWS] nenhuma notícia encontrada após fallbacks.")
     return []
@@ -131,22 +172,21 @@ def draw_news_page(
     asset: dict,
     spec: dict = NEWS_SPEC,
     bg_img: str | None = None,
-    api_key: str | None = None
+    articles: list[dict] | None = None,
 ):
     """
     Desenha uma página com 2 cards de notícia para o ativo recebido.
     Cada card: imagem (cover), tarja preta com título (centralizado),
     e o rótulo “Acessar notícia” clicável abaixo do card.
+    `articles` vem resolvido do prefetch (render_prefetch), com a imagem já
+    baixada em "image_data": nada aqui acessa a rede.
     """
     # Fundo
     w, h = A4
     bg = bg_img or spec.get("bg") or NEWS_PAGE_BG_IMG
     c.drawImage(img_path(bg), 0, 0, width=w, height=h)
 
-    # Busca notícias do símbolo
-    a = normalize_asset_minimal(asset)
-    api_key = api_key or get_fmp_key()
-    arts = fetch_asset_news(api_key, a["symbol"], limit=2)
+    arts = articles or []
 
     def _draw_card(box, art: dict | None):
         x, y, W, H = box["x"], box["y"], box["w"], box["h"]
@@ -171,11 +211,10 @@ def draw_news_page(
         img_w = W - 2 * img_pad
         img_h = H - strip_h
 
-        img_url = art.get("image") or art.get("image_url") 
-        if img_url:
+        img_data = art.get("image_data")
+        if img_data:
             try:
-                if img_url:
-                    draw_image_cover(c, img_url, img_x, img_y, img_w, img_h)
+                draw_image_cover(c, img_data, img_x, img_y, img_w, img_h)
             except Exception as exc:
                 # fallback discreto
                 c.setFillColorRGB(0.90, 0.90, 0.90)
@@ -192,8 +231,6 @@ def draw_news_page(
         c.roundRect(x, y, W, strip_h, r, stroke=0, fill=1)
 
         # TÍTULO na tarja (centralizado)
-        title_en = (art.get("title") or "").strip()
-        title_pt = translate_en_to_pt(title_en) or title_en
         title = dedupe_sentences(art.get("title") or "").strip() or "Sem título"
         pad   = spec.get("title_pad", 10)
         font  = spec.get("title_font", ("Helvetica-Bold", 11))
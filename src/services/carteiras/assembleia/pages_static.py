@@ -1,8 +1,5 @@
-import os
-import requests
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.lib.pagesizes import A4
-from .utils import translate_en_to_pt 
 
 # IMPORTS que faltavam
 from .constants import (
@@ -10,6 +7,7 @@ from .constants import (
     MODELO_PROTECAO, RISCO_CALCULADO, ACUMULO_CAPITAL, REITS, HEDGE, MENSAL, ETF_PAGE_BG_IMG # <- certifique-se de ter esses no constants.py
 )
 from .utils import wrap_and_draw  # <- usado para quebrar/desenhar texto
+from ..fmp.client import get_fmp_client
 
 
 def onpage_capa(c: Canvas, doc):
@@ -23,12 +21,12 @@ def fetch_general_market_news(api_key: str | None, limit: int = 3):
     """
     if not api_key:
         return []
-    base = "https://financialmodelingprep.com"
     try:
-        url = f"{base}/api/v3/stock_news?tickers=SPY,QQQ,DIA,GLD&limit={limit}&apikey={api_key}"
-        r = requests.get(url, timeout=8)
-        r.raise_for_status()
-        data = r.json() or []
+        data = get_fmp_client().get_json(
+            "api/v3/stock_news",
+            {"tickers": "SPY,QQQ,DIA,GLD", "limit": limit, "apikey": api_key},
+            timeout=8,
+        ) or []
         # saneamento: filtra itens sem title/url
         out = []
         for a in data:
@@ -60,7 +58,14 @@ def draw_globe_icon(c: Canvas, cx: float, cy: float, size: float = 14):
     c.line(cx, cy - r*0.9, cx, cy + r*0.9)
     c.restoreState()
 
-def onpage_noticias(c: Canvas, doc):
+def onpage_noticias_factory(news: list[dict]):
+    """onPage da página de notícias gerais a partir de itens já resolvidos (render_prefetch)."""
+    def _onpage(c: Canvas, doc):
+        draw_market_news_page(c, news)
+    return _onpage
+
+def draw_market_news_page(c: Canvas, news: list[dict]):
+    """3 cards de notícias gerais; título/descrição já traduzidos ("title_pt"/"desc_pt")."""
     # fundo
     w, h = A4
     c.drawImage(img_path(NEWS_BG_IMG), 0, 0, width=w, height=h)
@@ -72,8 +77,6 @@ def onpage_noticias(c: Canvas, doc):
         (45,  70, 510, 121),  # baixo
     ]
 
-    news = fetch_general_market_news(os.getenv("FMP_API_KEY"), limit=3)
-
     # estilos
     TITLE_FONT = ("Helvetica-Bold", 18)
     TITLE_LH   = 18
@@ -96,10 +99,8 @@ def onpage_noticias(c: Canvas, doc):
             c.drawString(x + LEFT_PAD, y + hh - 18, "Sem notícias disponíveis")
             continue
         
-        title_en = (art.get("title") or "").strip()
-        desc_en  = (art.get("text")  or "").strip()
-        title_pt = translate_en_to_pt(title_en) or title_en
-        desc_pt  = translate_en_to_pt(desc_en)  or desc_en
+        title_pt = art.get("title_pt") or (art.get("title") or "").strip()
+        desc_pt  = art.get("desc_pt")  or (art.get("text")  or "").strip()
         url   = art.get("url") or ""
         date  = art.get("publishedDate") or ""
 
@@ -2,7 +2,7 @@
 
 import logging
 import json, os
-import requests
+from functools import partial
 from datetime import datetime, date
 from calendar import monthrange
 try:
@@ -16,7 +16,17 @@ from src.services.carteiras.make_report import (
     fetch_equity,
     fetch_crypto,
     generate_chart,
+    crypto_fmp_pair,
+    crypto_yf_symbol,
+    prefetch_quotes,
+    prefetch_crypto_prices,
+    prefetch_vr,
+    prefetch_targets,
 )
+from src.services.carteiras.fmp.client import get_fmp_client
+from src.services.carteiras.fmp.history import HistoryProvider
+from src.services.carteiras.yahoo_batch import YahooBatch
+from src.services.carteiras.concurrency import run_all
 
 logger = logging.getLogger(__name__)
 _NOTES_CACHE = None
@@ -93,39 +103,96 @@ def _diff_report(before: Dict[str, Any], after: Dict[str, Any]) -> Tuple[List[st
                 changed.append(k)
     return sorted(set(changed)), sorted(set(added))
 
-def _force_equity(it: Dict[str, Any], is_etf: bool) -> Dict[str, Any]:
+def _equity_request(it: Dict[str, Any], is_etf: bool) -> Optional[tuple]:
     """
-    Sempre recalcula via fetch_equity; sobrepõe o retorno, mas preserva
-    alguns campos "manuais" úteis do payload original (ex.: logo_path).
+    Argumentos normalizados do item: (sym, is_etf, qty, tp, score, vr).
+    A busca de mercado é uma só por (sym, is_etf); o resto é aplicado por item.
     """
-    original = dict(it)  # cópia para diff
-
     sym = (it.get("symbol") or it.get("ticker") or "").strip().upper()
+    if not sym:
+        return None
     qty = _to_float_or_none(it.get("quantity")) or 0.0
     tp  = _coalesce(it.get("target_price"), it.get("targetPrice"))
     tp  = _to_float_or_none(tp)
     score = it.get("score")  # pode ser str/float; fetch_equity lida
+    vr_payload = _to_float_or_none(it.get("vr"))
+    return (sym, is_etf, qty, tp, score, vr_payload)
 
-    if not sym:
-        logger.warning("[ASSEMBLEIA:prep] item sem símbolo: %r", it)
-        return it
-
+def _market_request(reqs: List[tuple]) -> tuple:
+    """
+    Argumentos da busca de mercado compartilhada pelos itens do mesmo (sym, is_etf):
+    (sym, is_etf, tp, vr). Alvo/VR do payload só entram se TODOS os itens trazem
+    um; senão a busca usa os de mercado (algum item precisa deles).
+    """
+    sym, is_etf = reqs[0][:2]
+    tps, vrs = [r[3] for r in reqs], [r[5] for r in reqs]
+    return (sym, is_etf, None if None in tps else tps[0], None if None in vrs else vrs[0])
+
+def _apply_item_fields(out: Dict[str, Any], req: tuple) -> None:
+    """Campos do item sobre a busca compartilhada: quantidade/investimento, score, alvo/VP e VR do payload."""
+    if not out:
+        return
+    _sym, _is_etf, qty, tp, score, vr_payload = req
+    price = _to_float_or_none(out.get("unit_price"))
+    out["quantity"] = float(qty)
+    if price is not None:
+        out["investment"] = price * float(qty)
+    out["score"] = score
+    if tp is not None:
+        out["target_price"] = out["targetPrice"] = tp
+        out["vp"] = round((tp / price - 1.0) * 100.0, 2) if price else None
+    if vr_payload is not None:
+        out["vr"] = round(vr_payload, 2)
+
+def _fetch_equity_safe(req: tuple, quotes: Optional[Dict[str, dict]] = None,
+                       history: Optional[HistoryProvider] = None,
+                       vr_batch: Optional[Dict[str, float]] = None,
+                       yahoo: Optional[YahooBatch] = None,
+                       targets: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """fetch_equity p/ um _market_request (quantidade/score entram depois, por item)."""
+    sym, is_etf, tp, vr_payload = req
+    if tp is None:
+        tp = (targets or {}).get(sym)
+    if vr_payload is None:
+        vr_payload = (vr_batch or {}).get(sym)
     try:
-        vr_payload = _to_float_or_none(original.get("vr"))
-        fetched = fetch_equity(
-            sym, qty,
+        return fetch_equity(
+            sym, 0.0,
             is_etf=is_etf,
             antifragile=False,
             target_price=tp,
-            score=score,
             vr=vr_payload,
+            quote=(quotes or {}).get(sym),
+            history=history,
+            yahoo=yahoo,
         ) or {}
     except Exception as e:
         logger.warning("[ASSEMBLEIA:prep] fetch_equity falhou para %s: %s", sym, e)
-        fetched = {}
+        return {}
 
-    # Base = fetched (recalculado sempre)
+def _force_equity(it: Dict[str, Any], is_etf: bool, quotes: Optional[Dict[str, dict]] = None,
+                  fetched: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Sempre recalcula via fetch_equity; sobrepõe o retorno, mas preserva
+    alguns campos "manuais" úteis do payload original (ex.: logo_path).
+    `quotes` = cotações já buscadas em lote (prefetch_quotes).
+    `fetched` = retorno de fetch_equity já calculado (job graph, compartilhado
+    entre itens do mesmo símbolo); se None, busca aqui.
+    """
+    original = dict(it)  # cópia para diff
+
+    req = _equity_request(it, is_etf)
+    if req is None:
+        logger.warning("[ASSEMBLEIA:prep] item sem símbolo: %r", it)
+        return it
+    sym, tp = req[0], req[3]
+
+    if fetched is None:
+        fetched = _fetch_equity_safe(_market_request([req]), quotes)
+
+    # Base = fetched (recalculado sempre) + campos deste item
     out = dict(fetched)
+    _apply_item_fields(out, req)
 
     # Garanta o símbolo em maiúsculas
     out["symbol"] = sym
@@ -155,26 +222,46 @@ def _force_equity(it: Dict[str, Any], is_etf: bool) -> Dict[str, Any]:
 
     return out
 
-def _force_crypto(it: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Recalcula preço/dados via fetch_crypto; preserva entry/target/logo do body.
-    Mantém chart do body (se existir) — páginas de cripto esperam caminho existente.
-    """
-    original = dict(it)
+def _crypto_request(it: Dict[str, Any]) -> Optional[tuple]:
+    """Argumentos normalizados de fetch_crypto: (sym, qty, company_name, expected_growth)."""
     sym = (it.get("symbol") or "").strip().upper()
     if not sym:
-        logger.warning("[ASSEMBLEIA:prep] crypto sem símbolo: %r", it)
-        return it
-
+        return None
     qty = _to_float_or_none(it.get("quantity")) or 0.0
     expected_growth = _coalesce(it.get("average_growth"), it.get("averageGrowth"))
     company_name = it.get("company_name") or it.get("name")
+    return (sym, qty, company_name, expected_growth)
 
+def _fetch_crypto_safe(req: tuple, quotes: Optional[Dict[str, dict]] = None,
+                       cg_prices: Optional[Dict[str, float]] = None,
+                       yahoo: Optional[YahooBatch] = None) -> Dict[str, Any]:
+    sym, qty, company_name, expected_growth = req
     try:
-        fetched = fetch_crypto(sym, quantity=qty, company_name=company_name, expected_growth=expected_growth) or {}
+        return fetch_crypto(
+            sym, quantity=qty, company_name=company_name, expected_growth=expected_growth,
+            quote=(quotes or {}).get(crypto_fmp_pair(sym)),
+            cg_price=(cg_prices or {}).get(crypto_fmp_pair(sym)),
+            yahoo=yahoo,
+        ) or {}
     except Exception as e:
         logger.warning("[ASSEMBLEIA:prep] fetch_crypto falhou para %s: %s", sym, e)
-        fetched = {}
+        return {}
+
+def _force_crypto(it: Dict[str, Any], quotes: Optional[Dict[str, dict]] = None,
+                  fetched: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Recalcula preço/dados via fetch_crypto; preserva entry/target/logo do body.
+    Mantém chart do body (se existir) — páginas de cripto esperam caminho existente.
+    """
+    original = dict(it)
+    req = _crypto_request(it)
+    if req is None:
+        logger.warning("[ASSEMBLEIA:prep] crypto sem símbolo: %r", it)
+        return it
+    sym = req[0]
+
+    if fetched is None:
+        fetched = _fetch_crypto_safe(req, quotes)
 
     # Base = fetched
     out = dict(fetched)
@@ -194,16 +281,6 @@ def _force_crypto(it: Dict[str, Any]) -> Dict[str, Any]:
 
     return out
 
-def _prep_bucket_equities(bucket: List[Dict[str, Any]] | None, is_etf: bool) -> List[Dict[str, Any]]:
-    if not bucket:
-        return []
-    return [_force_equity(dict(it), is_etf=is_etf) for it in bucket]
-
-def _prep_bucket_crypto(bucket: List[Dict[str, Any]] | None) -> List[Dict[str, Any]]:
-    if not bucket:
-        return []
-    return [_force_crypto(dict(it)) for it in bucket]
-
 def _preserve_note(orig: dict, out: dict) -> dict:
     """Se o item original tiver 'note', preserva no item enriquecido."""
     n = (orig or {}).get("note")
@@ -287,11 +364,8 @@ def _earning_calendar_month(y: int, m: int) -> list[dict]:
         return []
     d0 = date(y, m, 1).isoformat()
     d1 = date(y, m, monthrange(y, m)[1]).isoformat()
-    url = "https://financialmodelingprep.com/api/v3/earning_calendar"
     params = {"from": d0, "to": d1, "apikey": FMP_API_KEY}
-    r = requests.get(url, params=params, timeout=20)
-    r.raise_for_status()
-    return r.json() if r.text.strip() else []
+    return get_fmp_client().get_json("api/v3/earning_calendar", params) or []
 
 def _status_str(raw: str | None) -> str:
     s = (raw or "").lower()
@@ -356,32 +430,96 @@ def append_earnings_notes_auto(enriched_payload: dict, mark_na: bool = True) ->
     return enriched_payload
 # ============================================================================ 
 
+# Buckets de equities/ETFs do payload da assembleia
+EQUITY_PREP_BUCKETS = (
+    "etfs_cons", "etfs_mod", "etfs_agr",
+    "stocks_mod", "stocks_arj", "stocks_opp",
+    "reits_cons", "smallcaps_arj", "hedge",
+)
+# buckets buscados com is_etf=True (hedge segue como ação, como antes)
+ETF_PREP_BUCKETS = ("etfs_cons", "etfs_mod", "etfs_agr")
 
+def _item_symbol(it: Dict[str, Any]) -> str:
+    return (it.get("symbol") or it.get("ticker") or "").strip().upper()
 
-def enrich_payload_with_make_report(payload: Dict[str, Any]) -> Dict[str, Any]:
+def enrich_payload_with_make_report(payload: Dict[str, Any], max_workers: Optional[int] = None) -> Dict[str, Any]:
     """
     Reprocessa SEMPRE usando as funções do make_report.
     - ETFs/Ações: fetch_equity (is_etf True/False) + chart (fallback).
     - Crypto: fetch_crypto; preserva entry/target/logo/chart do body.
     - Bonds: mantidos (não há cálculo específico aqui).
+    Todos os buckets viram um único job graph: cada símbolo é buscado uma vez só
+    (mesmo em vários buckets, com quantidades/campos manuais diferentes), em
+    paralelo, limitado por max_workers (default: settings.REPORT_FETCH_CONCURRENCY);
+    quantidade, score, alvo e VR do payload são aplicados depois, por item.
     """
     enriched = dict(payload)  # cópia rasa
 
-    # ETFs
-    enriched["etfs_cons"] = _prep_bucket_equities(enriched.get("etfs_cons"), is_etf=True)
-    enriched["etfs_mod"]  = _prep_bucket_equities(enriched.get("etfs_mod"),  is_etf=True)
-    enriched["etfs_agr"]  = _prep_bucket_equities(enriched.get("etfs_agr"),  is_etf=True)
-
-    # Ações
-    enriched["stocks_mod"] = _prep_bucket_equities(enriched.get("stocks_mod"), is_etf=False)
-    enriched["stocks_arj"] = _prep_bucket_equities(enriched.get("stocks_arj"), is_etf=False)
-    enriched["stocks_opp"] = _prep_bucket_equities(enriched.get("stocks_opp"), is_etf=False)
-    enriched["reits_cons"] = _prep_bucket_equities(enriched.get("reits_cons"), is_etf=False)
-
-    # (se usar smallcaps)
-    enriched["smallcaps_arj"] = _prep_bucket_equities(enriched.get("smallcaps_arj"), is_etf=False)
-    # Criptos
-    enriched["crypto"] = _prep_bucket_crypto(enriched.get("crypto"))
-    enriched["hedge"] = _prep_bucket_equities(enriched.get("hedge"), is_etf=False)
+    # Cotações de todos os buckets em poucas chamadas em lote
+    quotes = prefetch_quotes(
+        (_item_symbol(it) for b in EQUITY_PREP_BUCKETS for it in (enriched.get(b) or [])),
+        (_item_symbol(it) for it in (enriched.get("crypto") or [])),
+    )
+    # CoinGecko em 1 chamada p/ criptos sem quote da FMP
+    cg_prices = prefetch_crypto_prices((_item_symbol(it) for it in (enriched.get("crypto") or [])), quotes)
+    # Histórico diário: 1 busca por símbolo, compartilhada entre buckets
+    history = HistoryProvider()
+    # Fallback Yahoo: 1 download multi-ticker (só se algum símbolo precisar)
+    yahoo = YahooBatch(
+        [_item_symbol(it) for b in EQUITY_PREP_BUCKETS for it in (enriched.get(b) or [])]
+        + [crypto_yf_symbol(_item_symbol(it)) for it in (enriched.get("crypto") or []) if _item_symbol(it)]
+    )
+    # Preço-alvo em lote para quem não trouxe alvo no payload
+    targets = prefetch_targets(
+        (_item_symbol(it) for b in EQUITY_PREP_BUCKETS for it in (enriched.get(b) or [])
+         if _to_float_or_none(_coalesce(it.get("target_price"), it.get("targetPrice"))) is None),
+        max_workers=max_workers,
+    )
+    # VR em lote (vetorizado) para quem não trouxe VR no payload
+    vr_batch = prefetch_vr(
+        (_item_symbol(it) for b in EQUITY_PREP_BUCKETS for it in (enriched.get(b) or [])
+         if _to_float_or_none(it.get("vr")) is None),
+        history, max_workers=max_workers,
+    )
+
+    # 1) jobs únicos (equities por (símbolo, is_etf); cripto por argumentos normalizados)
+    equity_reqs: Dict[tuple, List[tuple]] = {}
+    for bucket in EQUITY_PREP_BUCKETS:
+        is_etf = bucket in ETF_PREP_BUCKETS
+        for it in enriched.get(bucket) or []:
+            req = _equity_request(it, is_etf)
+            if req is not None:
+                equity_reqs.setdefault(req[:2], []).append(req)
+    jobs: Dict[tuple, Any] = {
+        ("equity",) + key: partial(_fetch_equity_safe, _market_request(reqs), quotes, history, vr_batch, yahoo, targets)
+        for key, reqs in equity_reqs.items()
+    }
+    for it in enriched.get("crypto") or []:
+        req = _crypto_request(it)
+        if req is not None:
+            jobs.setdefault(("crypto",) + req, partial(_fetch_crypto_safe, req, quotes, cg_prices, yahoo))
+
+    # 2) execução concorrente com teto global
+    keys = list(jobs)
+    fetched = dict(zip(keys, run_all((jobs[k] for k in keys), max_workers=max_workers)))
+    logger.info("[ASSEMBLEIA:prep] %d buscas únicas para %d itens.", len(keys),
+                sum(len(enriched.get(b) or []) for b in EQUITY_PREP_BUCKETS + ("crypto",)))
+
+    # 3) remonta cada bucket na ordem original (campos manuais/nota preservados)
+    for bucket in EQUITY_PREP_BUCKETS:
+        is_etf = bucket in ETF_PREP_BUCKETS
+        out = []
+        for it in enriched.get(bucket) or []:
+            req = _equity_request(it, is_etf)
+            res = fetched.get(("equity",) + req[:2]) if req is not None else None
+            out.append(_force_equity(dict(it), is_etf=is_etf, quotes=quotes, fetched=res))
+        enriched[bucket] = out
+
+    out = []
+    for it in enriched.get("crypto") or []:
+        req = _crypto_request(it)
+        res = fetched.get(("crypto",) + req) if req is not None else None
+        out.append(_force_crypto(dict(it), quotes=quotes, fetched=res))
+    enriched["crypto"] = out
 
     return enriched
@@ -0,0 +1,71 @@
+# src/services/carteiras/assembleia/render_prefetch.py
+from __future__ import annotations
+import logging
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..concurrency import run_all
+from ..fmp.client import get_fmp_client
+from .pages_news import fetch_asset_news_batch
+from .pages_static import fetch_general_market_news
+from .utils import fetch_image_bytes, normalize_asset_minimal, translate_en_to_pt
+
+log = logging.getLogger(__name__)
+
+MARKET_NEWS_LIMIT = 3
+ASSET_NEWS_LIMIT = 2
+
+def prefetch_render_data(
+    asset_lists: Iterable[List[dict]],
+    api_key: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Tudo que as páginas da assembleia buscariam na rede durante o doc.build,
+    resolvido antes e em paralelo:
+      1) notícias gerais do mercado + notícias de cada ativo com página de notícias;
+      2) traduções (título/descrição das gerais) + imagens das notícias dos ativos.
+    Retorna dados puros p/ o render só ler:
+      {"market_news": [{..., "title_pt", "desc_pt"}],
+       "asset_news": {SÍMBOLO: [{..., "image_data": bytes | None}]}}
+    """
+    api_key = api_key or get_fmp_client().api_key
+    symbols = list(dict.fromkeys(
+        sym for items in asset_lists for it in (items or [])
+        if (sym := normalize_asset_minimal(it)["symbol"])
+    ))
+
+    # 1) notícias (as dos ativos em lotes multi-ticker)
+    market, asset_news = run_all(
+        [partial(fetch_general_market_news, api_key, limit=MARKET_NEWS_LIMIT),
+         partial(fetch_asset_news_batch, api_key, symbols, limit=ASSET_NEWS_LIMIT)],
+        max_workers=max_workers,
+    )
+
+    # 2) traduções e imagens
+    texts = list(dict.fromkeys(
+        t for a in market for t in ((a.get("title") or "").strip(), (a.get("text") or "").strip()) if t
+    ))
+    urls = list(dict.fromkeys(
+        u for arts in asset_news.values() for a in arts if (u := a.get("image") or a.get("image_url"))
+    ))
+    resolved = run_all(
+        [partial(translate_en_to_pt, t) for t in texts] + [partial(fetch_image_bytes, u) for u in urls],
+        max_workers=max_workers,
+    )
+    translated = dict(zip(texts, resolved[:len(texts)]))
+    images = dict(zip(urls, resolved[len(texts):]))
+    log.info("[ASSEMBLEIA] prefetch render: %d notícias de ativos, %d traduções, %d/%d imagens",
+             sum(map(len, asset_news.values())), len(texts), sum(1 for v in images.values() if v), len(urls))
+
+    def _pt(text: str) -> str:
+        text = (text or "").strip()
+        return translated.get(text) or text
+
+    return {
+        "market_news": [{**a, "title_pt": _pt(a.get("title")), "desc_pt": _pt(a.get("text"))} for a in market],
+        "asset_news": {
+            s: [{**a, "image_data": images.get(a.get("image") or a.get("image_url"))} for a in arts]
+            for s, arts in asset_news.items()
+        },
+    }
@@ -12,6 +12,7 @@ from typing import Iterable, Optional
 import math 
 import re
 import os, requests
+from src.services.carteiras.circuit import guarded, raise_for_provider_error
 from .constants import IMAGES_DIR  
 
 def fmt_currency_usd(v) -> str:
@@ -122,13 +123,24 @@ def draw_centered_in_box(c: Canvas, text: str, x: float, y: float, w: float, h:
     ty = y + (h - size * 0.75) / 2 + size * 0.75  # centraliza pela “ascender” aproximada
     c.drawString(tx, ty, t)
 
+def fetch_image_bytes(url: str, timeout=4) -> bytes | None:
+    """Baixa uma imagem (p/ o prefetch antes do render). Falha -> None."""
+    try:
+        r = requests.get(url, timeout=timeout)
+        r.raise_for_status()
+        return r.content
+    except Exception:
+        return None
+
 def draw_image_cover(c, src, x, y, w, h, timeout=4):
     """
-    Desenha uma imagem cobrindo a área (cover). Aceita caminho local ou URL.
-    Usa timeout para URL e cai em placeholder se falhar.
+    Desenha uma imagem cobrindo a área (cover). Aceita bytes já baixados,
+    caminho local ou URL. Usa timeout para URL e cai em placeholder se falhar.
     """
     try:
-        if isinstance(src, str) and src.lower().startswith(("http://", "https://")):
+        if isinstance(src, (bytes, bytearray)):
+            img = ImageReader(BytesIO(src))
+        elif isinstance(src, str) and src.lower().startswith(("http://", "https://")):
             r = requests.get(src, timeout=timeout)
             r.raise_for_status()
             img = ImageReader(BytesIO(r.content))
@@ -188,52 +200,62 @@ def dedupe_sentences(text: str, max_sentences: int | None = None) -> str:
             break
     return " ".join(out)
 
+def _translate_deepl(text: str, deepl_key: str) -> Optional[str]:
+    url = "https://api-free.deepl.com/v2/translate"
+    headers = {"Authorization": f"DeepL-Auth-Key {deepl_key}"}
+    data = {"text": text, "source_lang": "EN", "target_lang": "PT-BR"}
+    r = requests.post(url, data=data, headers=headers, timeout=8)
+    raise_for_provider_error(r)
+    if r.ok:
+        js = r.json()
+        return (js.get("translations") or [{}])[0].get("text")
+    return None
+
+def _translate_gtx(text: str) -> Optional[str]:
+    url = "https://translate.googleapis.com/translate_a/single"
+    params = {"client": "gtx", "sl": "en", "tl": "pt", "dt": "t", "q": text}
+    r = requests.get(url, params=params, timeout=8)
+    raise_for_provider_error(r)
+    if r.ok:
+        js = r.json()
+        parts = []
+        for chunk in js[0]:
+            if chunk and len(chunk) > 0:
+                parts.append(chunk[0])
+        return "".join(parts).strip()
+    return None
+
+def _translate_libre(text: str) -> Optional[str]:
+    url = "https://libretranslate.de/translate"
+    r = requests.post(url, json={"q": text, "source": "en", "target": "pt", "format": "text"}, timeout=8)
+    raise_for_provider_error(r)
+    if r.ok:
+        return r.json().get("translatedText")
+    return None
+
 def translate_en_to_pt(text: str) -> str:
+    """
+    EN -> PT: DeepL (se houver chave) -> Google 'gtx' -> LibreTranslate.
+    Cada provedor tem circuit breaker: fora do ar, é pulado sem esperar timeout.
+    """
     if not text:
         return ""
     # 1) DeepL (se houver chave)
     deepl_key = os.getenv("DEEPL_API_KEY")
     if deepl_key:
-        try:
-            url = "https://api-free.deepl.com/v2/translate"
-            headers = {"Authorization": f"DeepL-Auth-Key {deepl_key}"}
-            data = {"text": text, "source_lang": "EN", "target_lang": "PT-BR"}
-            r = requests.post(url, data=data, headers=headers, timeout=8)
-            if r.ok:
-                js = r.json()
-                tr = (js.get("translations") or [{}])[0].get("text")
-                if tr:
-                    return tr
-        except Exception as e:
-            print(f"[TRAD] DeepL falhou: {e}")
+        tr = guarded("deepl", _translate_deepl, text, deepl_key)
+        if tr:
+            return tr
 
     # 2) Google 'gtx' (sem chave; pode rate-limit)
-    try:
-        url = "https://translate.googleapis.com/translate_a/single"
-        params = {"client": "gtx", "sl": "en", "tl": "pt", "dt": "t", "q": text}
-        r = requests.get(url, params=params, timeout=8)
-        if r.ok:
-            js = r.json()
-            parts = []
-            for chunk in js[0]:
-                if chunk and len(chunk) > 0:
-                    parts.append(chunk[0])
-            tr = "".join(parts).strip()
-            if tr:
-                return tr
-    except Exception as e:
-        print(f"[TRAD] Google gtx falhou: {e}")
+    tr = guarded("gtx", _translate_gtx, text)
+    if tr:
+        return tr
 
     # 3) LibreTranslate pública
-    try:
-        url = "https://libretranslate.de/translate"
-        r = requests.post(url, json={"q": text, "source": "en", "target": "pt", "format": "text"}, timeout=8)
-        if r.ok:
-            tr = r.json().get("translatedText")
-            if tr:
-                return tr
-    except Exception as e:
-        print(f"[TRAD] LibreTranslate falhou: {e}")
+    tr = guarded("libretranslate", _translate_libre, text)
+    if tr:
+        return tr
 
     return text
 
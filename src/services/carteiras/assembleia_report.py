@@ -1,13 +1,21 @@
 # src/services/carteiras/assembleia_report.py
+from functools import partial
 from typing import Any, Dict, Optional
 from io import BytesIO
 import logging
 from .assembleia.prep import enrich_payload_with_make_report, fill_auto_notes, append_earnings_notes_auto
 from .assembleia.builder import generate_assembleia_report
+from .assembleia.render_prefetch import prefetch_render_data
 from src.services.s3.aws_s3_service import upload_pdf_to_s3
 from src.services.carteiras.assembleia.constants import NOME_RELATORIO_ASSEMBLEIA, BUCKET_RELATORIOS
 from datetime import date, datetime, timedelta
-import os, requests
+from bisect import bisect_right
+import os
+from src.services.carteiras.fmp.history import load_daily_history
+from src.services.carteiras.fmp.ratelimit import quota_tracked
+from src.services.carteiras.concurrency import map_bounded, run_all
+from src.services.carteiras.trading_calendar import get_calendar
+from src.services.carteiras.snapshot import snapshot_scoped
 
 logger = logging.getLogger(__name__)
 
@@ -25,22 +33,24 @@ def _last_friday(d: date) -> date:
         last -= timedelta(days=1)
     return last
 
-def _fetch_close_price(symbol: str, day: date) -> float | None:
+def _fetch_closes(symbol: str, start: date, end: date) -> list[tuple[date, float]]:
+    """Closes (crescente) de [start, end] numa única consulta de intervalo."""
     api = os.getenv("FMP_API_KEY") or ""
     if not api:
-        return None
-    base = "https://financialmodelingprep.com/api/v3/historical-price-full"
-    url = f"{base}/{symbol.upper()}?from={day:%Y-%m-%d}&to={day:%Y-%m-%d}&apikey={api}"
+        return []
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        js = r.json() or {}
-        hist = js.get("historical") or []
-        if hist:
-            return float(hist[0].get("close"))
+        # store local de histórico: dias já baixados não voltam à FMP
+        df = load_daily_history(symbol.upper(), f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}")
     except Exception:
-        pass
-    return None
+        return []
+    if df.empty:
+        return []
+    return [(ts.date(), float(c)) for ts, c in zip(df["date"], df["close"]) if c == c]
+
+def _fetch_close_price(symbol: str, day: date) -> float | None:
+    """Close exato de `day` (None se não houve pregão/dado)."""
+    closes = _fetch_closes(symbol, day, day)
+    return closes[-1][1] if closes else None
 
 def _collect_all_items(enriched: dict) -> list[dict]:
     buckets = [
@@ -60,19 +70,56 @@ def _collect_all_items(enriched: dict) -> list[dict]:
             out.append(it)
     return out
 
-def _find_last_available_close(symbol: str, ref_date: date, max_lookback: int = 7) -> tuple[float | None, date | None]:
+def _find_last_available_close(symbol: str, ref_date: date, max_lookback: int = 7,
+                               crypto: bool = False) -> tuple[float | None, date | None]:
     """
-    Tenta pegar o close em ref_date. Se não houver (feriado/fds/sem dado),
-    volta 1 dia por vez até max_lookback dias. Retorna (preco, data_efetiva).
+    Último close disponível <= ref_date (feriado/fds/sem dado -> dias anteriores),
+    até max_lookback dias atrás. A janela termina no último pregão <= ref_date
+    (calendário NYSE; 24/7 p/ cripto), sem consultar dias sem pregão; uma consulta
+    cobre a janela toda e a escolha do dia é feita em memória. Retorna (preco, data_efetiva).
     """
-    d = ref_date
-    for _ in range(max_lookback + 1):
-        price = _fetch_close_price(symbol, d)
+    start = ref_date - timedelta(days=max_lookback)
+    end = get_calendar(crypto).last_session(ref_date)
+    if end < start:
+        return None, None
+    return _close_on_or_before(_fetch_closes(symbol, start, end), ref_date, max_lookback)
+
+def _close_on_or_before(closes: list[tuple[date, float]], day: date,
+                        max_lookback: int = 7) -> tuple[float | None, date | None]:
+    """Último close > 0 em [day - max_lookback, day] numa série crescente (bisect, sem rede)."""
+    floor = day - timedelta(days=max_lookback)
+    i = bisect_right(closes, (day, float("inf")))
+    while i > 0 and closes[i - 1][0] >= floor:
+        d, price = closes[i - 1]
         if price not in (None, 0):
             return price, d
-        d = d - timedelta(days=1)
+        i -= 1
     return None, None
 
+def prefetch_custom_range_prices(items: list[dict], max_lookback: int = 7) -> dict[tuple[str, date], float | None]:
+    """
+    Preços das páginas de intervalo customizado (entrada, saída e hoje), resolvidos
+    ANTES do render: 1 consulta de intervalo por símbolo cobrindo todas as suas
+    datas, símbolos em paralelo. Retorna {(símbolo, data): preço} p/ o desenho só ler.
+    """
+    today = date.today()
+    wanted: dict[str, set[date]] = {}
+    for it in items or []:
+        sym = (it.get("symbol") or "").strip().upper()
+        d0, d1 = _parse_front_date(it.get("start_date")), _parse_front_date(it.get("end_date"))
+        if sym and d0 and d1:
+            wanted.setdefault(sym, set()).update((d0, d1, today))
+
+    def _resolve(sym: str) -> dict[tuple[str, date], float | None]:
+        days = sorted(wanted[sym])
+        closes = _fetch_closes(sym, days[0] - timedelta(days=max_lookback), days[-1])
+        return {(sym, d): _close_on_or_before(closes, d, max_lookback)[0] for d in days}
+
+    out: dict[tuple[str, date], float | None] = {}
+    for part in map_bounded(_resolve, list(wanted)):
+        out.update(part)
+    return out
+
 def _parse_front_date(d) -> date | None:
     """Aceita date ou string (YYYY-MM-DD ou DD/MM/YYYY). Retorna date ou None."""
     if d is None:
@@ -114,14 +161,22 @@ def build_monthly_rows(
             "p0": None, "p1": None, "chg": None,
             "group": "bonds", "placeholder_bond": True,
         })
-    for it in _collect_all_items(enriched):
+    items = _collect_all_items(enriched)
+    # 1 consulta de intervalo por símbolo (sem repetir ticker), todas em paralelo
+    syms = list(dict.fromkeys((it.get("symbol") or "").upper() for it in items))
+
+    def _lookup(sym: str) -> tuple[float | None, date | None]:
+        return _find_last_available_close(sym, ref_date, crypto=_group_of_symbol(enriched, sym) == "crypto")
+
+    closes = dict(zip(syms, map_bounded(_lookup, syms)))
+    for it in items:
         sym  = (it.get("symbol") or "").upper()
         name = it.get("company_name") or it.get("name") or sym
         group = _group_of_symbol(enriched, sym)
         color = _rgb_for_group(group)
 
         # ← usa EXATAMENTE a data enviada; se não houver fechamento, volta dias
-        p_first, p0_used_date = _find_last_available_close(sym, ref_date)
+        p_first, p0_used_date = closes[sym]
 
         p_now = it.get("unit_price")
         chg = ((float(p_now)/float(p_first))-1.0)*100.0 if p_first not in (None,0) and p_now not in (None,0) else None
@@ -173,6 +228,8 @@ def _rgb_for_group(group: str) -> tuple[float, float, float]:
     # vermelho (demais)
     return (1.0, 1.0, 0.0)
 
+@quota_tracked("ASSEMBLEIA")
+@snapshot_scoped
 def build_report_assembleia_from_payload(payload: Dict[str, Any], selected_symbol: Optional[str] = None) -> BytesIO:
     
     enriched = enrich_payload_with_make_report(payload)
@@ -219,17 +276,25 @@ def build_report_assembleia_from_payload(payload: Dict[str, Any], selected_symbo
         len(monthly_rows),
     )
     
-    # 3) Montar PDF
+    # 3) Rede antes do render: preços dos intervalos + notícias/traduções/imagens, em paralelo
+    custom_range_prices, render_data = run_all([
+        partial(prefetch_custom_range_prices, custom_ranges),
+        partial(prefetch_render_data, [etfs_cons, etfs_mod, etfs_agr, stocks_mod, stocks_arj,
+                                       stocks_opp, reits_cons, smallcaps_arj, crypto, hedge]),
+    ])
+
+    # 4) Montar PDF (CPU apenas)
     buffer = generate_assembleia_report(
         bonds=bonds,
         etfs_cons=etfs_cons, etfs_mod=etfs_mod, etfs_agr=etfs_agr,
         stocks_mod=stocks_mod, stocks_arj=stocks_arj, stocks_opp=stocks_opp,
         reits_cons=reits_cons, smallcaps_arj=smallcaps_arj, crypto=crypto, hedge=hedge,
         monthly_rows=monthly_rows, monthly_label=monthly_label, custom_range_pages=custom_ranges,
-        text_assets=text_assets, fetch_price_fn=_fetch_close_price, 
+        text_assets=text_assets, fetch_price_fn=_fetch_close_price,
+        custom_range_prices=custom_range_prices, render_data=render_data,
     )
 
-    # 4) Upload (opcional) e retorno
+    # 5) Upload (opcional) e retorno
     upload_pdf_to_s3(buffer, NOME_RELATORIO_ASSEMBLEIA, BUCKET_RELATORIOS)
     logger.info("Relatorio gerado com sucesso!")
     return buffer
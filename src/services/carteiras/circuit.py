@@ -0,0 +1,102 @@
+# src/services/carteiras/circuit.py
+from __future__ import annotations
+import logging, threading, time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from src.config.settings import settings
+
+log = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitBreaker:
+    """
+    Circuit breaker por provedor externo (yfinance, CoinGecko, tradutores...).
+    - closed: chamadas passam; `failure_threshold` falhas seguidas abrem o circuito.
+    - open: chamadas são recusadas na hora até passar `cooldown` segundos.
+    - half_open: 1 chamada de prova passa; sucesso fecha, falha reabre.
+    Falha = exceção do provedor (rede, 429/5xx). "Sem dado" p/ um símbolo não conta.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, cooldown: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold or settings.CIRCUIT_FAILURE_THRESHOLD)
+        self.cooldown = settings.CIRCUIT_COOLDOWN_SECONDS if cooldown is None else cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.calls = self.short_circuited = self.total_failures = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state, self._probing = HALF_OPEN, False
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self._probing):
+                self._probing = self.state == HALF_OPEN
+                self.calls += 1
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                log.info("[circuit:%s] fechado (provedor voltou)", self.name)
+            self.state, self.failures, self._probing = CLOSED, 0, False
+
+    def record_failure(self, err: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.failures += 1
+            self.total_failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    log.warning("[circuit:%s] aberto por %.0fs após %d falha(s): %s",
+                                self.name, self.cooldown, self.failures, err)
+                self.state, self.opened_at, self._probing = OPEN, time.monotonic(), False
+
+    def call(self, fn: Callable[..., R], *args, default: Any = None, **kwargs) -> R:
+        """Executa fn se o circuito permitir; circuito aberto ou exceção -> default."""
+        if not self.allow():
+            return default
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            log.info("[circuit:%s] falha: %s", self.name, e)
+            self.record_failure(e)
+            return default
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "calls": self.calls,
+                    "short_circuited": self.short_circuited, "total_failures": self.total_failures}
+
+# ---------- Registro do processo ----------
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        br = _breakers.get(name)
+        if br is None:
+            br = _breakers[name] = CircuitBreaker(name)
+        return br
+
+def guarded(name: str, fn: Callable[..., R], *args, default: Any = None, **kwargs) -> R:
+    """Atalho: get_breaker(name).call(fn, ...)."""
+    return get_breaker(name).call(fn, *args, default=default, **kwargs)
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        items = list(_breakers.items())
+    return {name: br.stats() for name, br in items}
+
+def raise_for_provider_error(r) -> None:
+    """Erros do provedor (429/5xx) contam como falha; 4xx de dado ausente não."""
+    if r.status_code == 429 or r.status_code >= 500:
+        r.raise_for_status()
@@ -0,0 +1,131 @@
+# src/services/carteiras/concurrency.py
+from __future__ import annotations
+import contextvars, copy, queue, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from src.config.settings import settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+def map_bounded(fn: Callable[[T], R], items: Iterable[T], max_workers: Optional[int] = None) -> List[R]:
+    """
+    Aplica `fn` em `items` com no máximo `max_workers` threads (I/O de rede).
+    Preserva a ordem de entrada; a 1ª exceção (na ordem) é relançada, como no loop serial.
+    Cada tarefa roda numa cópia do contexto do chamador (contextvars: ex. cota por relatório).
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = max(1, min(max_workers or settings.REPORT_FETCH_CONCURRENCY, len(items)))
+    if workers == 1:
+        return [fn(it) for it in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-fetch") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, fn, it) for it in items]
+        return [f.result() for f in futures]
+
+def run_all(tasks: Iterable[Callable[[], Any]], max_workers: Optional[int] = None) -> List[Any]:
+    """Executa thunks (ex.: functools.partial) em paralelo limitado, mantendo a ordem."""
+    return map_bounded(lambda task: task(), tasks, max_workers=max_workers)
+
+# Pool próprio p/ corridas "hedged": perdedores seguem rodando sem ocupar o pool do relatório
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+def hedged_first(
+    sources: Sequence[Tuple[str, Callable[[], Optional[R]]]],
+    delay: float,
+    accept: Callable[[Any], bool] = lambda v: v is not None,
+) -> Tuple[Optional[R], Optional[str], Dict[str, float]]:
+    """
+    Corrida entre fontes equivalentes (na ordem de preferência): a 1ª começa já,
+    cada seguinte começa `delay` s depois (ou na hora, se a anterior falhar/vier
+    vazia); delay <= 0 dispara todas juntas. Vence o 1º resultado aceito.
+    Retorna (valor, fonte_vencedora, {fonte: latência_ms das que terminaram}).
+    """
+    done: "queue.Queue[Tuple[str, Any, float]]" = queue.Queue()
+    latencies: Dict[str, float] = {}
+
+    def _run(name: str, fn: Callable[[], Any]) -> None:
+        t0 = time.monotonic()
+        try:
+            value = fn()
+        except Exception:
+            value = None
+        done.put((name, value, (time.monotonic() - t0) * 1000.0))
+
+    started = pending = 0
+
+    def _start_next() -> None:
+        nonlocal started, pending
+        name, fn = sources[started]
+        started += 1
+        pending += 1
+        _HEDGE_POOL.submit(contextvars.copy_context().run, _run, name, fn)
+
+    _start_next()
+    while delay <= 0 and started < len(sources):
+        _start_next()
+    while pending:
+        try:
+            name, value, ms = done.get(timeout=delay if started < len(sources) else None)
+        except queue.Empty:
+            _start_next()   # fonte atual lenta: dispara a próxima em paralelo
+            continue
+        pending -= 1
+        latencies[name] = round(ms, 1)
+        if accept(value):
+            return value, name, latencies
+        if started < len(sources):
+            _start_next()
+    return None, None, latencies
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    Coalescência de chamadas idênticas em voo: o 1º chamador de uma chave executa
+    `fn`; os concorrentes com a mesma chave esperam e recebem o mesmo resultado
+    (cópia, pois respostas JSON são mutáveis) ou a mesma exceção.
+    Contadores: leaders (execuções reais) e shared (chamadas que pegaram carona).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], R]) -> R:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "shared": self.shared}
@@ -0,0 +1,264 @@
+# src/services/carteiras/fmp/client.py
+from __future__ import annotations
+import copy, os, logging, threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time as dtime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Union
+from zoneinfo import ZoneInfo
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config.settings import settings
+from src.services.carteiras.concurrency import SingleFlight
+from src.services.carteiras.negative_cache import get_negative_cache
+from src.services.carteiras.trading_calendar import get_calendar
+from .cache import TTLCache
+from .ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+# Timeout (s) por endpoint. Chave = 1º segmento depois da versão
+# (ex.: "api/v3/quote/AAPL" -> "quote", "stable/splits" -> "splits").
+ENDPOINT_TIMEOUTS: Dict[str, float] = {
+    "quote": 10,
+    "profile": 15,
+    "historical-price-full": 20,
+    "historical-chart": 20,
+    "price-target-summary": 20,
+    "splits": 20,
+    "stock_news": 12,
+    "general_news": 12,
+    "earning_calendar": 20,
+}
+
+NY_TZ = ZoneInfo("America/New_York")
+
+def until_next_session() -> float:
+    """Segundos até a virada p/ o próximo pregão NYSE (meia-noite de NY do dia dele)."""
+    now = datetime.now(NY_TZ)
+    cal, d = get_calendar(), now.date() + timedelta(days=1)
+    while not cal.is_session(d):
+        d += timedelta(days=1)
+    return max(1.0, (datetime.combine(d, dtime(), NY_TZ) - now).total_seconds())
+
+# TTL (s) do cache de respostas por tipo de dado; callable = calculado na gravação.
+# Ausente = não cacheia (ex.: histórico diário, que já fica no store local).
+CACHE_TTLS: Dict[str, Union[float, Callable[[], float]]] = {
+    "quote": 30,
+    "profile": 14 * 86400,
+    "price-target-summary": until_next_session,   # alvos mudam no máximo 1x por pregão
+    "stock_dividend": 86400,
+    "splits": 86400,
+    "earning_calendar": 6 * 3600,
+    "stock_news": 600,
+    "general_news": 600,
+}
+
+# Tipos de dado por símbolo cujas respostas vazias vão p/ o negative cache
+NEGATIVE_KINDS = frozenset({"profile", "stock_dividend", "price-target-summary"})
+
+# Respostas fixadas (ex.: snapshot de mercado): {cache_key: json}. Quando ativas
+# no contexto, get_json responde delas sem rede.
+_pinned: ContextVar[Optional[Mapping[tuple, Any]]] = ContextVar("fmp_pinned_responses", default=None)
+
+@contextmanager
+def pinned_responses(responses: Optional[Mapping[tuple, Any]]) -> Iterator[None]:
+    token = _pinned.set(responses)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+# ---------- Helpers ----------
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After em segundos (aceita número ou data HTTP); None se ausente/inválido."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def clean_api_key(v: Optional[str]) -> str:
+    """Remove espaços/quebras e o prefixo 'FMP_API_KEY=' (quando o .env vem errado)."""
+    v = (v or "").strip().replace("\r", "").replace("\n", "")
+    if "FMP_API_KEY=" in v:
+        v = v.split("=", 1)[1]
+    return v
+
+def endpoint_of(path: str) -> str:
+    parts = [p for p in (path or "").strip("/").split("/") if p]
+    if parts[:1] == ["api"]:
+        parts = parts[2:]   # descarta "api/v3"
+    elif parts[:1] == ["stable"]:
+        parts = parts[1:]
+    return parts[0] if parts else ""
+
+def cache_kind(path: str) -> str:
+    """Tipo de dado p/ TTL: como endpoint_of, mas separa dividendos do histórico de preço."""
+    kind = endpoint_of(path)
+    if kind == "historical-price-full" and "/stock_dividend/" in f"/{path.strip('/')}/":
+        return "stock_dividend"
+    return kind
+
+def symbol_of(path: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Símbolo da consulta: params['symbol'] ou o último segmento do path."""
+    sym = (params or {}).get("symbol") or (path or "").rstrip("/").rsplit("/", 1)[-1]
+    return str(sym).strip().upper()
+
+class _ServerErrorRetry(Retry):
+    """Retry do urllib3 sem 429: o urllib3 re-tenta 429 com Retry-After mesmo fora do forcelist."""
+    RETRY_AFTER_STATUS_CODES = frozenset({413, 503})
+
+# ---------- Client ----------
+class FMPClient:
+    """
+    Cliente HTTP único da FMP: mantém conexões keep-alive num pool
+    (requests.Session + HTTPAdapter), aplica uma única política de
+    retry/backoff e escolhe o timeout pelo endpoint.
+    Respostas ficam num cache LRU em memória com TTL por tipo de dado
+    (CACHE_TTLS): segundos p/ quotes, até o próximo pregão p/ alvos, 1 dia p/
+    dividendos, semanas p/ perfil.
+    Requisições idênticas simultâneas (mesmo path/params) viram uma só (single-flight).
+    Toda requisição enviada passa pelo token bucket do processo (cota do plano);
+    429 é re-tentado aqui (não no urllib3), 1 token por tentativa, e o Retry-After
+    esvazia o bucket p/ todas as chamadas esperarem.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        *,
+        pool_size: Optional[int] = None,
+        retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        cache_ttls: Optional[Dict[str, Union[float, Callable[[], float]]]] = None,
+        cache_size: Optional[int] = None,
+    ):
+        self._api_key = api_key
+        self.base_url = (base_url or settings.FMP_BASE_URL).rstrip("/")
+        self.timeouts = {**ENDPOINT_TIMEOUTS, **(timeouts or {})}
+        self.default_timeout = settings.REQUEST_TIMEOUT
+        self.cache_ttls = {**CACHE_TTLS, **(cache_ttls or {})} if settings.FMP_CACHE_ENABLED else {}
+        self.cache = TTLCache(cache_size or settings.FMP_CACHE_SIZE)
+        self.inflight = SingleFlight()
+        self.limiter = TokenBucket(settings.FMP_CALLS_PER_MINUTE, settings.FMP_RATE_BURST,
+                                   max_wait=settings.FMP_RATE_MAX_WAIT)
+
+        retries = settings.FMP_RETRIES if retries is None else retries
+        # 429 fica fora do Retry do urllib3: é re-tentado em _fetch, 1 token por tentativa
+        self.rate_limit_retries = retries
+        retry = _ServerErrorRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=settings.FMP_BACKOFF if backoff is None else backoff,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        pool_size = pool_size or settings.FMP_POOL_SIZE
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": "bella-relatorios/1.0"})
+
+    @property
+    def api_key(self) -> str:
+        # lido a cada chamada: o .env pode ser carregado depois do import
+        return clean_api_key(self._api_key or os.getenv("FMP_API_KEY"))
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def timeout_for(self, path: str) -> float:
+        return self.timeouts.get(endpoint_of(path), self.default_timeout)
+
+    def cache_key(self, path: str, params: Optional[Dict[str, Any]] = None) -> tuple:
+        # apikey fora da chave: mesma resposta p/ qualquer chave válida
+        items = tuple(sorted((k, str(v)) for k, v in (params or {}).items() if k != "apikey"))
+        return (path.strip("/"), items)
+
+    def get_json(self, path: str, params: Optional[Dict[str, Any]] = None, *,
+                 timeout: Optional[float] = None, cache: bool = True) -> Any:
+        """
+        GET autenticado em `path` (relativo ao base_url).
+        Levanta requests.HTTPError para status != 2xx; retorna o JSON (None se corpo vazio).
+        Respostas não vazias são cacheadas pelo TTL do tipo de dado; vazias de
+        perfil/dividendos/alvo marcam o símbolo no negative cache e, enquanto
+        valer, retornam None sem ir à rede (cache=False ignora os dois).
+        """
+        kind = cache_kind(path)
+        ttl = self.cache_ttls.get(kind, 0) if cache else 0
+        ckey = self.cache_key(path, params)
+        pinned = _pinned.get()
+        if pinned is not None and ckey in pinned:
+            return copy.deepcopy(pinned[ckey])
+        if ttl:
+            hit = self.cache.get(ckey)
+            if hit is not None:
+                return hit
+        neg_key = (f"fmp:{kind}", symbol_of(path, params)) if cache and kind in NEGATIVE_KINDS else None
+        if neg_key and get_negative_cache().is_missing(*neg_key):
+            return None
+
+        data = self.inflight.do(ckey, lambda: self._fetch(path, params, timeout))
+        if ttl and data:
+            self.cache.set(ckey, data, ttl() if callable(ttl) else ttl)
+        if neg_key and not data:
+            get_negative_cache().mark_missing(*neg_key)
+        return data
+
+    def _fetch(self, path: str, params: Optional[Dict[str, Any]], timeout: Optional[float]) -> Any:
+        params = dict(params or {})
+        key = clean_api_key(params.get("apikey")) or self.api_key
+        if key:
+            params["apikey"] = key
+        for attempt in range(self.rate_limit_retries + 1):
+            self.limiter.acquire()
+            r = self.session.get(self.url(path), params=params, timeout=timeout or self.timeout_for(path))
+            if r.status_code != 429 or attempt == self.rate_limit_retries:
+                break
+            retry_after = retry_after_seconds(r.headers.get("Retry-After"))
+            log.info("FMP 429 em %s; Retry-After=%s (tentativa %d)", endpoint_of(path), retry_after, attempt + 1)
+            self.limiter.penalize(retry_after)
+        r.raise_for_status()
+        if not r.text.strip():
+            return None
+        return r.json()
+
+# ---------- Instância do processo ----------
+_client: Optional[FMPClient] = None
+_client_lock = threading.Lock()
+
+def get_fmp_client() -> FMPClient:
+    """Retorna o cliente compartilhado (criado sob demanda)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = FMPClient()
+    return _client
+
+def set_fmp_client(client: Optional[FMPClient]) -> None:
+    """Substitui o cliente do processo (ex.: outro base_url). None recria com os defaults."""
+    global _client
+    with _client_lock:
+        _client = client
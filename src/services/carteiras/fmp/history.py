@@ -0,0 +1,91 @@
+# src/services/carteiras/fmp/history.py
+from __future__ import annotations
+import logging, threading
+from datetime import date, timedelta
+from typing import Dict
+
+import pandas as pd
+
+from .client import get_fmp_client
+from .store import get_price_store
+from src.services.carteiras.snapshot import active_snapshot
+
+log = logging.getLogger(__name__)
+
+HISTORY_COLUMNS = ["date", "open", "high", "low", "close", "adjClose", "volume"]
+
+# Janela padrão: cobre VR (5 anos), crescimento 1y, barras semanais e VS.
+DEFAULT_HISTORY_YEARS = 5
+
+def _empty_history() -> pd.DataFrame:
+    return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+def fetch_daily_history(symbol: str, start: str, end: str) -> pd.DataFrame:
+    """
+    Baixa o histórico diário (historical-price-full) de [start, end].
+    Retorna DF em ordem crescente com as colunas de HISTORY_COLUMNS que a FMP fornecer.
+    """
+    sym = (symbol or "").strip().upper()
+    js = get_fmp_client().get_json(f"api/v3/historical-price-full/{sym}", {"from": start, "to": end})
+    hist = js.get("historical") if isinstance(js, dict) else js
+    df = pd.DataFrame(hist or [])
+    if df.empty or "date" not in df.columns or "close" not in df.columns:
+        return _empty_history()
+    df = df[[c for c in HISTORY_COLUMNS if c in df.columns]].copy()
+    df["date"] = pd.to_datetime(df["date"])
+    return df.sort_values("date").drop_duplicates("date", keep="last").reset_index(drop=True)
+
+def load_daily_history(symbol: str, start: str, end: str) -> pd.DataFrame:
+    """
+    Histórico diário de [start, end] lido do store local (só o trecho que falta
+    vai à FMP). Sem store disponível, busca direto na FMP.
+    Sob um snapshot de mercado ativo, a janela sai do snapshot quando ele a cobre.
+    """
+    snap = active_snapshot()
+    if snap is not None:
+        df = snap.history_slice(symbol, start, end)
+        if df is not None:
+            return df
+    store = get_price_store()
+    if store is None:
+        return fetch_daily_history(symbol, start, end)
+    return store.daily(symbol, start, end, fetch_daily_history)
+
+class HistoryProvider:
+    """
+    Histórico diário por símbolo, buscado UMA vez por requisição na janela mais
+    larga necessária (`years`). Barras semanais, VS, crescimento 1y, EMAs e VR
+    derivam todos desse mesmo DataFrame.
+    Thread-safe: chamadas concorrentes para o mesmo símbolo aguardam a 1ª busca.
+    """
+
+    def __init__(self, years: int = DEFAULT_HISTORY_YEARS):
+        self.years = years
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, sym: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(sym, threading.Lock())
+
+    def daily(self, symbol: str) -> pd.DataFrame:
+        """DF diário (crescente) da janela inteira; vazio se a FMP falhar."""
+        sym = (symbol or "").strip().upper()
+        if not sym:
+            return _empty_history()
+        df = self._frames.get(sym)
+        if df is not None:
+            return df
+        with self._lock_for(sym):
+            df = self._frames.get(sym)
+            if df is None:
+                today = date.today()
+                start = (today - timedelta(days=int(365.25 * self.years))).isoformat()
+                try:
+                    df = load_daily_history(sym, start, today.isoformat())
+                except Exception as e:
+                    log.warning("Histórico FMP falhou p/ %s: %s", sym, e)
+                    df = _empty_history()
+                self._frames[sym] = df
+        return df
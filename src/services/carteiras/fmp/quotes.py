@@ -0,0 +1,41 @@
+# src/services/carteiras/fmp/quotes.py
+from __future__ import annotations
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from .client import get_fmp_client
+
+log = logging.getLogger(__name__)
+
+# A FMP aceita lista separada por vírgula em /quote; lotes evitam URLs gigantes.
+QUOTE_CHUNK_SIZE = 50
+
+def _norm_symbol(sym: str) -> str:
+    return (sym or "").strip().upper()
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def fetch_quotes_batch(symbols: Iterable[str], *, chunk_size: int = QUOTE_CHUNK_SIZE,
+                       api_key: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Busca /api/v3/quote para vários símbolos em poucas chamadas (lotes de `chunk_size`).
+    Retorna {SYMBOL: linha_da_quote}. Lotes que falham são ignorados
+    (quem consome faz a chamada individual como fallback).
+    """
+    uniq = list(dict.fromkeys(s for s in (_norm_symbol(x) for x in symbols) if s))
+    out: Dict[str, dict] = {}
+    fmp = get_fmp_client()
+    params = {"apikey": api_key} if api_key else None
+    for chunk in _chunks(uniq, max(1, chunk_size)):
+        try:
+            data = fmp.get_json(f"api/v3/quote/{','.join(chunk)}", params) or []
+        except Exception as e:
+            log.warning("FMP quote em lote falhou (%d símbolos): %s", len(chunk), e)
+            continue
+        for row in data if isinstance(data, list) else []:
+            sym = _norm_symbol(row.get("symbol"))
+            if sym and row.get("price") is not None:
+                out[sym] = row
+    return out
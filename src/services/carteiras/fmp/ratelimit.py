@@ -0,0 +1,126 @@
+# src/services/carteiras/fmp/ratelimit.py
+from __future__ import annotations
+import contextvars, functools, logging, threading, time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable)
+
+log = logging.getLogger(__name__)
+
+class RateLimitExceeded(RuntimeError):
+    """Espera por token passaria do limite (max_wait): a chamada é recusada."""
+
+# ---------- Contabilidade por relatório ----------
+@dataclass
+class QuotaUsage:
+    calls: int = 0          # requisições enviadas à FMP
+    throttled: int = 0      # chamadas que esperaram por token
+    rejected: int = 0       # chamadas recusadas (espera > max_wait)
+    limited: int = 0        # respostas 429 da FMP (re-tentadas via bucket)
+    wait_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, *, calls: int = 0, throttled: int = 0, rejected: int = 0,
+            limited: int = 0, wait: float = 0.0) -> None:
+        with self._lock:
+            self.calls += calls
+            self.throttled += throttled
+            self.rejected += rejected
+            self.limited += limited
+            self.wait_seconds += wait
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {"calls": self.calls, "throttled": self.throttled, "rejected": self.rejected,
+                    "limited": self.limited, "wait_seconds": round(self.wait_seconds, 3)}
+
+_usage: contextvars.ContextVar[Optional[QuotaUsage]] = contextvars.ContextVar("fmp_quota_usage", default=None)
+
+@contextmanager
+def track_quota() -> Iterator[QuotaUsage]:
+    """Abre um escopo de contabilidade (ex.: um relatório); threads de map_bounded herdam o escopo."""
+    usage = QuotaUsage()
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+def quota_tracked(label: str) -> Callable[[F], F]:
+    """Decorator: roda a função num escopo track_quota e loga o consumo de cota ao final."""
+    def deco(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track_quota() as usage:
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    log.info("[%s] cota FMP: %s", label, usage.as_dict())
+        return wrapper  # type: ignore[return-value]
+    return deco
+
+# ---------- Token bucket ----------
+class TokenBucket:
+    """
+    Token bucket compartilhado por todas as chamadas à FMP do processo.
+    Cada chamada reserva o próximo token sob lock (ordem de chegada = ordem de
+    atendimento) e dorme só o tempo até o token existir — sem polling nem sleep
+    "às cegas". O reabastecimento é (calls_per_minute - burst)/60 por segundo,
+    então nenhuma janela de 60s passa de calls_per_minute.
+    """
+
+    def __init__(self, calls_per_minute: int, burst: int = 10, max_wait: float = 60.0):
+        self.capacity = max(1, int(burst))
+        self.rate = max(1.0, float(calls_per_minute) - self.capacity) / 60.0
+        self.max_wait = max_wait
+        self._tokens = float(self.capacity)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+        self.total = QuotaUsage()
+
+    def acquire(self) -> float:
+        """Reserva 1 token; bloqueia até ele existir. Retorna os segundos esperados."""
+        usage = _usage.get()
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            wait = max(0.0, (1.0 - self._tokens) / self.rate)
+            if wait > self.max_wait:
+                self.total.add(rejected=1)
+                if usage is not None:
+                    usage.add(rejected=1)
+                raise RateLimitExceeded(f"FMP: espera de {wait:.1f}s por token excede {self.max_wait:.0f}s")
+            self._tokens -= 1.0   # pode ficar negativo: fila de reservas
+        throttled = int(wait > 0)
+        self.total.add(calls=1, throttled=throttled, wait=wait)
+        if usage is not None:
+            usage.add(calls=1, throttled=throttled, wait=wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """
+        429 da FMP: esvazia o bucket p/ que o próximo token (de qualquer chamada)
+        só exista daqui a `retry_after` s; sem Retry-After, zera os tokens e o
+        ritmo cai p/ o reabastecimento. O re-envio passa por acquire() como as demais.
+        """
+        usage = _usage.get()
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            floor = 1.0 - max(0.0, retry_after) * self.rate if retry_after is not None else 0.0
+            self._tokens = min(self._tokens, floor)
+        self.total.add(limited=1)
+        if usage is not None:
+            usage.add(limited=1)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            tokens = min(self.capacity, self._tokens + (time.monotonic() - self._stamp) * self.rate)
+        return {**self.total.as_dict(), "tokens": round(tokens, 2),
+                "capacity": self.capacity, "refill_per_s": round(self.rate, 3)}
@@ -0,0 +1,261 @@
+# src/services/carteiras/fmp/store.py
+from __future__ import annotations
+import logging, os, sqlite3, threading, time
+from datetime import date
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config.settings import settings
+
+log = logging.getLogger(__name__)
+
+BAR_FIELDS = ("open", "high", "low", "close", "adjClose", "volume")
+
+# fetch_fn(symbol, start, end) -> DF com "date" + (parte de) BAR_FIELDS
+FetchFn = Callable[[str, str, str], pd.DataFrame]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol   TEXT NOT NULL,
+    date     TEXT NOT NULL,
+    open     REAL, high REAL, low REAL, close REAL, adjClose REAL, volume REAL,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage (
+    symbol     TEXT PRIMARY KEY,
+    first_date TEXT NOT NULL,   -- 1ª barra devolvida pela FMP
+    last_date  TEXT NOT NULL,   -- última barra devolvida pela FMP
+    updated_at REAL NOT NULL,   -- epoch da última busca do fim da janela na FMP
+    asked_first TEXT,           -- início mais antigo já pedido (antes da listagem não há barra)
+    asked_last  TEXT            -- fim mais recente já pedido (fds/feriado não têm barra)
+);
+"""
+
+# Colunas acrescentadas depois da 1ª versão do schema (bancos já existentes)
+_MIGRATIONS = {
+    "asked_first": "ALTER TABLE coverage ADD COLUMN asked_first TEXT",
+    "asked_last": "ALTER TABLE coverage ADD COLUMN asked_last TEXT",
+}
+
+# ---------- Helpers ----------
+def _iso(d) -> str:
+    return pd.Timestamp(d).strftime("%Y-%m-%d")
+
+def _ref_price(df: pd.DataFrame) -> pd.Series:
+    """adjClose quando existe; senão close (usado p/ detectar reajuste retroativo)."""
+    adj = df["adjClose"] if "adjClose" in df.columns else pd.Series(np.nan, index=df.index)
+    return adj.astype(float).fillna(df["close"].astype(float))
+
+def _span(df: Optional[pd.DataFrame]) -> Optional[Tuple[str, str]]:
+    """(1ª, última) data efetivamente retornada; None se a busca veio vazia."""
+    if df is None or df.empty or "date" not in df.columns:
+        return None
+    dates = pd.to_datetime(df["date"]).dropna()
+    if dates.empty:
+        return None
+    return _iso(dates.min()), _iso(dates.max())
+
+# ---------- Store ----------
+class PriceHistoryStore:
+    """
+    Histórico diário persistido em SQLite, chave (symbol, date).
+    Barras passadas não mudam: cada leitura só busca na FMP o trecho que falta
+    antes/depois da janela já coberta, com 1 barra de sobreposição. Se o preço
+    ajustado dessa barra mudou (dividendo/split novo reajusta o passado), a
+    janela inteira do símbolo é baixada de novo.
+
+    Barras datadas do dia da última busca ou depois podem ter sido gravadas
+    com o pregão aberto: são sobrescritas sem contar como reajuste, e a
+    sobreposição usa a última barra fechada. O fim da janela é rebuscado no
+    máximo a cada `refresh_seconds`; datas já pedidas sem barra (fds, feriado,
+    antes da listagem) não geram nova consulta.
+    """
+
+    def __init__(self, path: str, refresh_seconds: Optional[float] = None):
+        self.path = path
+        self.refresh_seconds = settings.PRICE_STORE_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.executescript("PRAGMA journal_mode=WAL;" + _SCHEMA)
+        cols = {row[1] for row in self._conn.execute("PRAGMA table_info(coverage)")}
+        for col, ddl in _MIGRATIONS.items():
+            if col not in cols:
+                self._conn.execute(ddl)
+        self._db_lock = threading.Lock()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, sym: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(sym, threading.Lock())
+
+    # ----- SQL -----
+    def _coverage(self, sym: str):
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT first_date, last_date, updated_at, asked_first, asked_last "
+                "FROM coverage WHERE symbol = ?", (sym,)
+            ).fetchone()
+
+    def _set_coverage(self, sym: str, first: str, last: str, asked_first: str, asked_last: str,
+                      updated_at: Optional[float] = None) -> None:
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO coverage "
+                "(symbol, first_date, last_date, updated_at, asked_first, asked_last) VALUES (?, ?, ?, ?, ?, ?)",
+                (sym, first, last, time.time() if updated_at is None else updated_at, asked_first, asked_last),
+            )
+
+    def _read(self, sym: str, start: str, end: str) -> pd.DataFrame:
+        with self._db_lock:
+            df = pd.read_sql_query(
+                f"SELECT date, {', '.join(BAR_FIELDS)} FROM bars "
+                "WHERE symbol = ? AND date BETWEEN ? AND ? ORDER BY date",
+                self._conn, params=(sym, start, end),
+            )
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def _last_bar_date(self, sym: str, before: str) -> Optional[str]:
+        """Última barra gravada com data < before."""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT MAX(date) FROM bars WHERE symbol = ? AND date < ?", (sym, before)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _write(self, sym: str, df: pd.DataFrame, *, replace: bool = False) -> None:
+        rows = []
+        if df is not None and not df.empty:
+            df = df.reindex(columns=["date", *BAR_FIELDS])
+            dates = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+            vals = df[list(BAR_FIELDS)].apply(pd.to_numeric, errors="coerce").astype(float)
+            vals = vals.astype(object).where(vals.notna(), None)
+            rows = [(sym, d, *v) for d, v in zip(dates, vals.itertuples(index=False, name=None))]
+        with self._db_lock, self._conn:
+            if replace:
+                self._conn.execute("DELETE FROM bars WHERE symbol = ?", (sym,))
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO bars (symbol, date, {', '.join(BAR_FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(BAR_FIELDS))})",
+                rows,
+            )
+
+    # ----- Sincronização -----
+    def _adjustment_changed(self, sym: str, fetched: pd.DataFrame, start: str, end: str,
+                            settled_before: str) -> bool:
+        """
+        True se alguma barra FECHADA já gravada em [start, end] veio com preço
+        ajustado diferente. Barras com data >= settled_before podem ter sido
+        gravadas com o pregão aberto e ficam fora da comparação.
+        """
+        if fetched is None or fetched.empty:
+            return False
+        stored = self._read(sym, start, end)
+        stored = stored[stored["date"] < pd.Timestamp(settled_before)]
+        if stored.empty:
+            return False
+        new = fetched.assign(date=pd.to_datetime(fetched["date"]))
+        m = stored[["date"]].assign(old=_ref_price(stored)).merge(
+            new[["date"]].assign(new=_ref_price(new)), on="date", how="inner"
+        ).dropna()
+        return bool(len(m)) and not np.allclose(m["old"], m["new"], rtol=1e-6, atol=0.0)
+
+    def _extend(self, sym: str, fetch_fn: FetchFn, start: str, end: str,
+                first: str, last: str, settled_before: str) -> Tuple[Optional[Tuple[str, str]], bool]:
+        """
+        Busca [start, end] e mescla; se o ajuste mudou, rebaixa a janela [first, last] inteira.
+        Retorna (span do que foi gravado, se a janela foi substituída).
+        """
+        fetched = fetch_fn(sym, start, end)
+        if self._adjustment_changed(sym, fetched, start, end, settled_before):
+            log.info("Ajuste de preço mudou p/ %s; rebaixando %s..%s", sym, first, last)
+            full = fetch_fn(sym, first, last)
+            if _span(full) is not None:
+                self._write(sym, full, replace=True)
+                return _span(full), True
+        self._write(sym, fetched)
+        return _span(fetched), False
+
+    def daily(self, symbol: str, start, end, fetch_fn: FetchFn) -> pd.DataFrame:
+        """
+        Histórico diário de [start, end] (crescente), completando na FMP só o que falta.
+        Se a busca incremental falhar, devolve o que já está gravado.
+        A cobertura só cresce até as datas que a FMP de fato devolveu: resposta
+        vazia não marca a janela como baixada (a próxima leitura tenta de novo).
+        """
+        sym = (symbol or "").strip().upper()
+        today = date.today().isoformat()
+        start, end = _iso(start), min(_iso(end), today)
+        if start > end:
+            start = end
+
+        with self._lock_for(sym):
+            cov = self._coverage(sym)
+            if cov is None:
+                fetched = fetch_fn(sym, start, end)
+                span = _span(fetched)
+                if span is not None:
+                    self._write(sym, fetched, replace=True)
+                    self._set_coverage(sym, *span, start, end)
+                return self._read(sym, start, end)
+
+            first, last, updated_at, asked_first, asked_last = cov
+            asked_first, asked_last = asked_first or first, asked_last or last
+            # barras do dia da última busca em diante podem ter sido gravadas com o pregão aberto
+            settled_before = date.fromtimestamp(updated_at).isoformat()
+            stale = (time.time() - updated_at) > self.refresh_seconds
+            want_first, want_last = min(first, start), max(last, end)
+            try:
+                spans, tail = [], None
+                if start < asked_first:
+                    # backfill até o 1º dia coberto (sobrepõe 1 barra)
+                    spans.append(self._extend(sym, fetch_fn, start, first, want_first, want_last, settled_before))
+                    asked_first = start
+                if end > asked_last or (stale and end >= settled_before):
+                    # incremental a partir da última barra fechada (sobrepõe 1 barra)
+                    tail_from = self._last_bar_date(sym, settled_before) or first
+                    tail = self._extend(sym, fetch_fn, tail_from, end, want_first, want_last, settled_before)
+                    spans.append(tail)
+                    asked_last = max(asked_last, end)
+                if not spans:
+                    return self._read(sym, start, end)
+                new_first, new_last = first, last
+                for span, replaced in spans:
+                    if span is None:
+                        continue
+                    if replaced:
+                        new_first, new_last = span
+                    else:
+                        new_first, new_last = min(new_first, span[0]), max(new_last, span[1])
+                # o relógio do fim da janela só anda se o fim veio de fato (vazio = tenta de novo)
+                tail_ok = tail is not None and tail[0] is not None
+                self._set_coverage(sym, new_first, new_last, asked_first, asked_last,
+                                   None if tail_ok else updated_at)
+            except Exception as e:
+                log.warning("Store de preços: atualização falhou p/ %s (%s); usando o que está gravado", sym, e)
+            return self._read(sym, start, end)
+
+# ---------- Instância do processo ----------
+_store: Optional[PriceHistoryStore] = None
+_store_failed = False
+_store_lock = threading.Lock()
+
+def get_price_store() -> Optional[PriceHistoryStore]:
+    """Store compartilhado (criado sob demanda). None se desabilitado ou se o arquivo não abrir."""
+    global _store, _store_failed
+    if _store is None and not _store_failed:
+        with _store_lock:
+            if _store is None and not _store_failed:
+                path = settings.PRICE_STORE_PATH
+                if not path:
+                    _store_failed = True
+                    return None
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+                    _store = PriceHistoryStore(path)
+                except Exception as e:
+                    log.warning("Store de preços indisponível (%s): %s", path, e)
+                    _store_failed = True
+    return _store
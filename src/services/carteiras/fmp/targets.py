@@ -1,13 +1,15 @@
 # src/services/fmp/targets.py
 from __future__ import annotations
-import os, time, logging
+import os, logging
 from dataclasses import dataclass
-from typing import Iterable, List, Dict, Optional, Tuple
-import requests
+from typing import Iterable, List, Dict, Optional
+
+from src.services.carteiras.concurrency import map_bounded
+from .client import get_fmp_client
 
 log = logging.getLogger(__name__)
 
-FMP_V4 = "https://financialmodelingprep.com/api/v4/price-target-summary"
+FMP_V4 = "api/v4/price-target-summary"
 
 # ---------- Model ----------
 @dataclass(frozen=True)
@@ -30,19 +32,12 @@ def _norm_symbol(sym: str) -> str:
     # A FMP geralmente usa símbolos “puros” (AAPL, MSFT, AMZN). Para cripto/pares, você já trata em outros pontos.
     return (sym or "").strip().upper()
 
-def _get(url: str, params: dict, tries: int = 3, backoff: float = 1.6, timeout: int = 20) -> dict | list | None:
-    last_err = None
-    for i in range(tries):
-        try:
-            r = requests.get(url, params=params, timeout=timeout)
-            if r.ok:
-                return r.json()
-            last_err = RuntimeError(f"HTTP {r.status_code}: {r.text[:200]}")
-        except Exception as e:
-            last_err = e
-        time.sleep(backoff ** (i + 1))
-    log.warning("FMP GET falhou: %s", last_err)
-    return None
+def _get(path: str, params: dict, timeout: Optional[float] = None) -> dict | list | None:
+    try:
+        return get_fmp_client().get_json(path, params, timeout=timeout)
+    except Exception as e:
+        log.warning("FMP GET falhou: %s", e)
+        return None
 
 def _parse_summary(sym: str, js: dict | list | None):
     if not js:
@@ -83,32 +78,30 @@ def _parse_summary(sym: str, js: dict | list | None):
         source="fmp",
     )
 
+def _fetch_one(sym: str, k: str) -> PriceTargetSummary | None:
+    # resposta fica no cache do cliente até o próximo pregão (CACHE_TTLS)
+    return _parse_summary(sym, _get(FMP_V4, {"symbol": sym, "apikey": k}))
+
 # ---------- Public API ----------
 def fetch_price_target_summary(symbol: str, api_key: Optional[str] = None) -> PriceTargetSummary | None:
     """
-    Busca o resumo de price target na FMP para 1 símbolo.
+    Busca o resumo de price target na FMP para 1 símbolo (cache do pregão).
     """
     sym = _norm_symbol(symbol)
     k = _get_api_key(api_key)
-    js = _get(FMP_V4, {"symbol": sym, "apikey": k})
-    return _parse_summary(sym, js)
+    return _fetch_one(sym, k)
 
-def fetch_price_targets_batch(symbols: Iterable[str], api_key: Optional[str] = None) -> Dict[str, PriceTargetSummary]:
+def fetch_price_targets_batch(symbols: Iterable[str], api_key: Optional[str] = None,
+                              max_workers: Optional[int] = None) -> Dict[str, PriceTargetSummary]:
     """
-    Busca price targets para vários símbolos (chamadas 1 a 1, com backoff).
+    Busca price targets para vários símbolos em paralelo (limitado; a cota passa
+    pelo rate limiter do cliente), com cache por pregão.
     Retorna um dict {SYMBOL: PriceTargetSummary}.
     """
-    out: Dict[str, PriceTargetSummary] = {}
     k = _get_api_key(api_key)
-    for s in symbols:
-        sym = _norm_symbol(s)
-        if not sym:
-            continue
-        js = _get(FMP_V4, {"symbol": sym, "apikey": k})
-        pt = _parse_summary(sym, js)
-        if pt:
-            out[sym] = pt
-    return out
+    syms = list(dict.fromkeys(s for s in map(_norm_symbol, symbols) if s))
+    results = map_bounded(lambda sym: _fetch_one(sym, k), syms, max_workers=max_workers)
+    return {sym: pt for sym, pt in zip(syms, results) if pt}
 
 def enrich_targets(items: List[Dict], *, prefer_payload: bool = True, api_key: Optional[str] = None) -> List[Dict]:
     """
@@ -1,11 +1,13 @@
 # --- Standard library
 from io import BytesIO
 from datetime import date, timedelta
+from functools import partial
 from typing import Any, Dict, List, Optional
 import os
 import shutil
 import subprocess
 import tempfile
+import threading
 
 # --- Third-party
 import matplotlib
@@ -17,19 +19,143 @@ import yfinance as yf
 from dotenv import load_dotenv
 
 # --- Local application
+from src.config.settings import settings
 from src.services.carteiras.pdf_generator import generate_pdf_buffer
-from src.services.carteiras.metrics.vr_utils import compute_vr_for_symbol
-from src.services.carteiras.fmp.targets import fetch_price_target_summary
+from src.services.carteiras.metrics.vr_utils import compute_vr_for_symbol, compute_vr_batch
+from src.services.carteiras.fmp.targets import fetch_price_target_summary, fetch_price_targets_batch
+from src.services.carteiras.fmp.client import get_fmp_client
+from src.services.carteiras.fmp.quotes import fetch_quotes_batch
+from src.services.carteiras.fmp.history import HistoryProvider, load_daily_history
+from src.services.carteiras.fmp.ratelimit import quota_tracked
+from src.services.carteiras.concurrency import hedged_first, map_bounded, run_all
+from src.services.carteiras.circuit import guarded, raise_for_provider_error
+from src.services.carteiras.negative_cache import get_negative_cache, guarded_miss
+from src.services.carteiras.yahoo_batch import YahooBatch
+from src.services.carteiras.snapshot import active_snapshot, snapshot_scoped
+from src.services.carteiras.trading_calendar import get_calendar
 
 load_dotenv()
 FMP_API_KEY = os.getenv("FMP_API_KEY")
 
-def _last_friday_for_weekly_change(d: date) -> date:
-    if d.weekday() == 4:          # se hoje for sexta, usar a sexta ANTERIOR
-        d = d - timedelta(days=7)
-    while d.weekday() != 4:       # senão, usa a sexta ≤ hoje
-        d -= timedelta(days=1)
-    return d
+# Buckets de equities/ETFs do payload canônico (build_report_from_payload)
+EQUITY_BUCKETS = ("reits", "stocks", "opp_stocks", "etfs", "etfs_rf", "etfs_op", "etfs_af", "hedge")
+
+def crypto_fmp_pair(symbol: str) -> str:
+    """BTC / BTC-USD / btcusd -> BTCUSD (formato da FMP)."""
+    pair = (symbol or "").strip().upper().replace("-", "")
+    return pair if pair.endswith("USD") else f"{pair}USD"
+
+def crypto_yf_symbol(symbol: str) -> str:
+    """BTC / BTC-USD -> BTC-USD (formato do yfinance)."""
+    sym = (symbol or "").strip().upper()
+    return sym if "-" in sym else f"{sym}-USD"
+
+# yfinance -> id da CoinGecko (demais: prefixo em minúsculas)
+COINGECKO_IDS = {
+    "BTC-USD": "bitcoin", "ETH-USD": "ethereum",
+    "SOL-USD": "solana",  "ADA-USD": "cardano", "BNB-USD": "binancecoin"
+}
+
+def coingecko_id(symbol: str) -> str:
+    sym_yf = crypto_yf_symbol(symbol)
+    return COINGECKO_IDS.get(sym_yf) or sym_yf.split("-")[0].lower()
+
+def fetch_coingecko_prices(ids) -> Dict[str, float]:
+    """
+    Preço em USD de várias moedas numa única chamada simple/price (ids separados por vírgula).
+    Ids sem preço vão p/ o negative cache; provedor fora do ar -> {} (circuit breaker).
+    """
+    neg = get_negative_cache()
+    uniq = [i for i in dict.fromkeys(x for x in ids if x) if not neg.is_missing("coingecko:price", i)]
+    if not uniq:
+        return {}
+
+    def _fetch():
+        r = requests.get(
+            "https://api.coingecko.com/api/v3/simple/price",
+            params={"ids": ",".join(uniq), "vs_currencies": "usd"},
+            timeout=10
+        )
+        raise_for_provider_error(r)
+        return r.json() if r.ok else None
+
+    data = guarded("coingecko", _fetch)
+    if not isinstance(data, dict):
+        return {}
+    out = {i: float(data[i]["usd"]) for i in uniq if "usd" in (data.get(i) or {})}
+    for i in uniq:
+        if i not in out:
+            neg.mark_missing("coingecko:price", i)
+    return out
+
+def prefetch_crypto_prices(crypto_symbols, quotes: Dict[str, dict]) -> Dict[str, float]:
+    """
+    CoinGecko em 1 chamada p/ as criptos que ficaram sem preço no /quote em lote.
+    Chave: par FMP (BTCUSD).
+    """
+    missing = {crypto_fmp_pair(str(s)): coingecko_id(str(s)) for s in crypto_symbols if s}
+    missing = {pair: cg for pair, cg in missing.items() if (quotes.get(pair) or {}).get("price") is None}
+    if not missing:
+        return {}
+    prices = fetch_coingecko_prices(missing.values())
+    return {pair: prices[cg] for pair, cg in missing.items() if cg in prices}
+
+def prefetch_quotes(equity_symbols, crypto_symbols=()) -> Dict[str, dict]:
+    """
+    Cotações de todos os símbolos do payload em poucas chamadas em lote.
+    Chaves: símbolo da equity (AAPL) e par FMP da cripto (BTCUSD).
+    """
+    syms = [str(s).strip().upper() for s in equity_symbols if s]
+    syms += [crypto_fmp_pair(str(s)) for s in crypto_symbols if s]
+    snap = active_snapshot()
+    if snap is None:
+        return fetch_quotes_batch(syms)
+    out = {s: snap.quotes[s] for s in syms if s in snap.quotes}
+    rest = [s for s in syms if s not in out]
+    return {**out, **(fetch_quotes_batch(rest) if rest else {})}
+
+def prefetch_vr(symbols, history: HistoryProvider, max_workers: Optional[int] = None) -> Dict[str, float]:
+    """
+    VR (vs SPY) de todos os símbolos sem VR no payload numa única passada vetorizada.
+    O histórico vem do HistoryProvider da requisição (reaproveitado depois pelo fetch_equity).
+    Símbolos ausentes do retorno caem no cálculo individual dentro de fetch_equity.
+    """
+    syms = list(dict.fromkeys(str(s).strip().upper() for s in symbols if s))
+    snap = active_snapshot()
+    cached = {s: snap.vr[s] for s in syms if s in snap.vr} if snap is not None else {}
+    syms = [s for s in syms if s not in cached]
+    if not syms:
+        return cached
+    try:
+        frames = dict(zip(syms, map_bounded(history.daily, syms, max_workers=max_workers)))
+        res = compute_vr_batch(syms, benchmark="SPY", years=5, min_obs=150,
+                               prices=frames, max_workers=max_workers)
+    except Exception as e:
+        print(f"[WARN] VR em lote falhou: {e}")
+        return cached
+    return {**cached, **{sym: r.get("VR") for sym, r in res.items()}}
+
+def prefetch_targets(symbols, max_workers: Optional[int] = None) -> Dict[str, float]:
+    """
+    Preço-alvo médio (FMP price-target-summary) de todos os símbolos sem alvo no
+    payload, numa única etapa concorrente. Ausentes caem na busca individual do fetch_equity.
+    """
+    syms = [str(s).strip().upper() for s in symbols if s]
+    snap = active_snapshot()
+    cached = {s: snap.targets[s] for s in syms if s in snap.targets} if snap is not None else {}
+    syms = [s for s in syms if s not in cached]
+    if not syms:
+        return cached
+    try:
+        pts = fetch_price_targets_batch(syms, max_workers=max_workers)
+    except Exception as e:
+        print(f"[WARN] price targets em lote falharam: {e}")
+        return cached
+    return {**cached, **{sym: float(pt.target_avg) for sym, pt in pts.items() if pt.target_avg is not None}}
+
+def _last_friday_for_weekly_change(d: date, crypto: bool = False) -> date:
+    """Sexta anterior se d for sexta, senão a sexta ≤ d; em feriado, o pregão anterior (24/7 p/ cripto)."""
+    return get_calendar(crypto).weekly_reference(d)
 def calculate_technical_indicators(bars: List[Any]):
     """
     Calcula indicadores técnicos (EMA10, EMA20, EMA200) a partir dos dados históricos.
@@ -62,6 +188,10 @@ def calculate_technical_indicators(bars: List[Any]):
 
     return ema_10_value, ema_20_value, ema_200_value, df
 
+# pyplot usa estado global (figura corrente): serializa os gráficos
+# quando os símbolos são buscados em paralelo.
+_CHART_LOCK = threading.Lock()
+
 def generate_chart(symbol: str, weekly_bars: List[Any], target_price: Optional[float], current_price: Optional[float] = None, outdir="templates/static"):
     """
     Gera gráfico SEMANAL com EMA10, EMA20 e EMA200.
@@ -70,6 +200,10 @@ def generate_chart(symbol: str, weekly_bars: List[Any], target_price: Optional[f
     if not weekly_bars or len(weekly_bars) < 10:
         print(f"⚠️ Dados semanais insuficientes para {symbol} (mín. 10 candles).")
         return None
+    with _CHART_LOCK:
+        return _generate_chart_locked(symbol, weekly_bars, target_price, current_price, outdir)
+
+def _generate_chart_locked(symbol: str, weekly_bars: List[Any], target_price: Optional[float], current_price: Optional[float], outdir: str):
 
     # DataFrame semanal
     df = pd.DataFrame([{'date': b.date, 'close': b.close} for b in weekly_bars])
@@ -165,42 +299,38 @@ def _crypto_daily_from_fmp(symbol: str, years: int = 1) -> pd.DataFrame:
     """
     Busca histórico DIÁRIO de cripto na FMP (ex.: BTCUSD/ETHUSD) e
     retorna SOMENTE o último ano por padrão.
+    Pede à FMP só a janela necessária (from/to) e guarda as barras no store
+    local: chamadas seguintes baixam apenas os dias novos.
     Retorna DF com colunas: date, open, high, low, close, volume.
     """
     api_key = os.getenv("FMP_API_KEY")
     if not api_key:
         return pd.DataFrame()
 
-    pair = symbol.upper().strip()
-    if not pair.endswith("USD"):
-        pair = f"{pair}USD"
-
-    sess = requests.Session()
-    sess.headers.update({"User-Agent": "make_report-crypto/1.0"})
-
-    def _full():
-        url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{pair}"
-        try:
-            r = sess.get(url, params={"apikey": api_key}, timeout=20)
-            r.raise_for_status()
-            data = r.json()
-            return data.get("historical") if isinstance(data, dict) else None
-        except Exception:
-            return None
+    pair = crypto_fmp_pair(symbol)
+    cols = ["date", "open", "high", "low", "close", "volume"]
+    end = date.today()
+    start = end - timedelta(days=int(365.25 * (years or 1)) + 7)
+    cutoff = pd.Timestamp.today().normalize() - pd.DateOffset(years=years or 1)
 
-    def _chart_1d():
-        url = f"https://financialmodelingprep.com/api/v3/historical-chart/1day/{pair}"
-        try:
-            r = sess.get(url, params={"apikey": api_key}, timeout=20)
-            r.raise_for_status()
-            return r.json()  # lista de dicts
-        except Exception:
-            return None
+    # 1) store local (já vem tipado, ordenado e sem datas repetidas)
+    try:
+        df = load_daily_history(pair, start.isoformat(), end.isoformat())
+    except Exception:
+        df = pd.DataFrame()
+    if not df.empty:
+        return df.loc[df["date"] >= cutoff, cols].reset_index(drop=True)
 
-    hist = _full() or _chart_1d()
+    # 2) fallback: historical-chart/1day, também limitado à janela
+    try:
+        hist = get_fmp_client().get_json(
+            f"api/v3/historical-chart/1day/{pair}",
+            {"from": start.isoformat(), "to": end.isoformat(), "apikey": api_key},
+        )  # lista de dicts
+    except Exception:
+        hist = None
     if not hist:
         return pd.DataFrame()
-
     df = pd.DataFrame(hist).rename(columns={"datetime": "date"})
     if "date" not in df or "close" not in df:
         return pd.DataFrame()
@@ -211,7 +341,6 @@ def _crypto_daily_from_fmp(symbol: str, years: int = 1) -> pd.DataFrame:
     df = df[~df["date"].duplicated(keep="last")]
 
     # apenas o último ano
-    cutoff = pd.Timestamp.today().normalize() - pd.DateOffset(years=years or 1)
     df = df[df["date"] >= cutoff]
 
     # garante colunas esperadas
@@ -224,7 +353,7 @@ def _crypto_daily_from_fmp(symbol: str, years: int = 1) -> pd.DataFrame:
         if col in df:
             df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    return df[["date", "open", "high", "low", "close", "volume"]]
+    return df[cols]
 
 def _to_weekly(df_daily: pd.DataFrame) -> pd.DataFrame:
     """Agrega diário → semanal, fechando na sexta (W-FRI)."""
@@ -252,14 +381,24 @@ def fetch_equity(
     target_price: Optional[float] = None,
     score: str = "–",
     vr: Optional[float] = None,   # <<< NOVO: volatilidade vinda do payload
-    vs: Optional[float] = None    # <<< OPCIONAL: valorização semanal vinda do payload
+    vs: Optional[float] = None,   # <<< OPCIONAL: valorização semanal vinda do payload
+    quote: Optional[dict] = None, # linha de /quote já buscada em lote (prefetch_quotes)
+    history: Optional[HistoryProvider] = None,  # histórico diário compartilhado na requisição
+    yahoo: Optional[YahooBatch] = None,         # fallback Yahoo em lote da requisição
 ):
     """
     Busca preço (FMP), calcula indicadores semanais, dividend yield (FMP→YF fallback),
     CAGR 10y (FMP→YF fallback), nome/segmento e gera gráfico semanal.
+    Se `quote` vier (prefetch em lote), não consulta /quote de novo.
+    O histórico diário é buscado uma única vez (HistoryProvider) e reaproveitado
+    por VS, barras semanais, EMAs, crescimento 1y e VR.
+    Fallbacks Yahoo (dividendos, crescimento 1y) saem de um único download em lote (YahooBatch).
     Retorna dict pronto para o template.
     """
 
+    fmp = get_fmp_client()
+    yahoo = yahoo or YahooBatch([symbol])
+
     # ----------------------------
     # Helpers internos
     # ----------------------------
@@ -267,17 +406,17 @@ def fetch_equity(
     def _dividend_yield_fallback(symbol_: str, price_: float | None) -> float | None:
         if price_ is None or price_ <= 0:
             return None
-        try:
-            t = yf.Ticker(symbol_)
-            dv = t.dividends
+
+        def _yf_dividends():
+            dv = yahoo.dividends(symbol_)
             if dv is not None and not dv.empty:
                 cutoff = pd.Timestamp.today() - pd.DateOffset(years=1)
                 ult12 = dv[dv.index >= cutoff].sum()
                 if ult12 and ult12 > 0:
                     return float(ult12) / float(price_)
-        except Exception:
-            pass
-        return None
+            return None
+
+        return guarded_miss("yfinance", "yf:dividends", symbol_, _yf_dividends)
 
     def _dividend_yield_fmp(symbol_: str, price_: float | None, api_key: Optional[str] = None) -> float | None:
         if price_ is None or price_ <= 0:
@@ -286,10 +425,10 @@ def fetch_equity(
         if not api_key:
             return None
         try:
-            url = f"https://financialmodelingprep.com/api/v3/historical-price-full/stock_dividend/{symbol_.upper()}?apikey={api_key}"
-            r = requests.get(url, timeout=10)
-            r.raise_for_status()
-            data = r.json()
+            data = fmp.get_json(
+                f"api/v3/historical-price-full/stock_dividend/{symbol_.upper()}",
+                {"apikey": api_key}, timeout=10,
+            ) or {}
             hist = data.get("historical") or data.get("historicalDividends")
             if not hist:
                 return None
@@ -315,12 +454,12 @@ def fetch_equity(
             pass
         return _dividend_yield_fallback(sym, price__)
 
-    def _growth_1y_pct(symbol: str, api_key: Optional[str] = FMP_API_KEY) -> float | None:
+    def _growth_1y_pct(symbol: str, df_hist: Optional[pd.DataFrame] = None) -> float | None:
         """
         Retorna o crescimento acumulado (fração) dos ÚLTIMOS ~12 meses:
             (preço_final / preço_inicial) - 1
 
-        - Usa FMP (serietype=line) como primária.
+        - Usa o histórico diário FMP já carregado (df_hist) como primária.
         - Faz fallback para Yahoo Finance (1y, ajustado).
         - Retorna None se não houver dados suficientes.
         """
@@ -330,41 +469,29 @@ def fetch_equity(
 
         cutoff = pd.Timestamp.today() - pd.DateOffset(years=1)
 
-        # ---------- 1) Tenta FMP (linha diária) ----------
-        if api_key:
+        # ---------- 1) Histórico FMP (linha diária) ----------
+        if df_hist is not None and not df_hist.empty:
             try:
-                url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{sym}?serietype=line&apikey={api_key}"
-                r = requests.get(url, timeout=20)
-                r.raise_for_status()
-                raw = (r.json() or {}).get("historical", [])
-                if isinstance(raw, list) and raw:
-                    df = pd.DataFrame(raw)
-                    if {"date", "close"}.issubset(df.columns):
-                        df["date"] = pd.to_datetime(df["date"])
-                        df = df.sort_values("date")
-
-                        # Janela de ~1 ano
-                        df_win = df[df["date"] >= cutoff]
-                        # Se muito ralo (ex.: poucos pregões), amplia levemente a janela
-                        if len(df_win) < 2:
-                            cutoff2 = pd.Timestamp.today() - pd.DateOffset(days=420)
-                            df_win = df[df["date"] >= cutoff2]
-
-                        if len(df_win) >= 2:
-                            first = float(df_win["close"].iloc[0])
-                            last  = float(df_win["close"].iloc[-1])
-                            if first > 0:
-                                return (last / first) - 1.0
+                df = df_hist[["date", "close"]].sort_values("date")
+
+                # Janela de ~1 ano
+                df_win = df[df["date"] >= cutoff]
+                # Se muito ralo (ex.: poucos pregões), amplia levemente a janela
+                if len(df_win) < 2:
+                    cutoff2 = pd.Timestamp.today() - pd.DateOffset(days=420)
+                    df_win = df[df["date"] >= cutoff2]
+
+                if len(df_win) >= 2:
+                    first = float(df_win["close"].iloc[0])
+                    last  = float(df_win["close"].iloc[-1])
+                    if first > 0:
+                        return (last / first) - 1.0
             except Exception as e:
                 print(f"[WARN] FMP 1y growth falhou p/ {sym}: {e}")
 
         # ---------- 2) Fallback Yahoo (1y ajustado) ----------
-        try:
-            if yf is None:
-                raise RuntimeError("yfinance não disponível")
-            t = yf.Ticker(sym)
-            # 1 ano, mensal geralmente basta; se quiser mais granular, use '1wk' ou '1d'
-            hist = t.history(period="1y", interval="1mo", auto_adjust=True)
+        def _yf_growth():
+            hist = yahoo.history(sym)   # 1 ano diário (ajustado), do lote
             if not hist.empty and "Close" in hist:
                 s = hist["Close"].dropna()
                 if len(s) >= 2:
@@ -372,20 +499,14 @@ def fetch_equity(
                     last  = float(s.iloc[-1])
                     if first > 0:
                         return (last / first) - 1.0
-        except Exception as e:
-            print(f"[WARN] YF 1y growth falhou p/ {sym}: {e}")
+            return None
 
-        return None
+        return guarded_miss("yfinance", "yf:history", sym, _yf_growth)
     try:
         sym = symbol.strip().upper()
 
         # --- preço atual ---
-        price_response = requests.get(
-            f"https://financialmodelingprep.com/api/v3/quote/{sym}?apikey={FMP_API_KEY}",
-            timeout=20
-        )
-        price_response.raise_for_status()
-        price_data = price_response.json()
+        price_data = [quote] if quote else fmp.get_json(f"api/v3/quote/{sym}")
         if not isinstance(price_data, list) or not price_data:
             raise ValueError(f"Dados de preço inválidos para {sym}")
         price = price_data[0].get("price")
@@ -393,47 +514,39 @@ def fetch_equity(
             raise ValueError(f"Não foi possível obter preço para {sym}")
         price = float(price)
 
-        # --- histórico diário -> weekly bars + VS semanal ---
+        # --- histórico diário (1 busca, janela larga) -> weekly bars + VS semanal ---
+        # O mesmo DF alimenta VS, barras semanais/EMAs, crescimento 1y e VR.
         vs_pct = None
         weekly_bars: list = []
-        historical_response = requests.get(
-            f"https://financialmodelingprep.com/api/v3/historical-price-full/{sym}?timeseries=260&apikey={FMP_API_KEY}",
-            timeout=20
-        )
-        if historical_response.ok:
-            historical_data = historical_response.json()
-            if "historical" in historical_data:
-                # já vem em ordem decrescente; inverter para crescente
-                daily_data = historical_data["historical"][::-1]
-                if daily_data:
-                    df_daily = pd.DataFrame(daily_data)
-                    df_daily["date"] = pd.to_datetime(df_daily["date"])
-                    df_daily = df_daily.set_index("date").sort_index()
-
-                    # VS semanal: spot vs última sexta
-                    try:
-                        last_friday = pd.Timestamp.today().normalize() - pd.offsets.Week(weekday=4)
-                        s_close = df_daily["close"].dropna()
-                        ref = s_close.loc[s_close.index <= last_friday]
-                        if not ref.empty:
-                            friday_close = float(ref.iloc[-1])
-                            if friday_close > 0:
-                                vs_pct = (price / friday_close - 1.0) * 100.0
-                    except Exception:
-                        vs_pct = None
-
-                    # gera barras semanais
-                    for _, week_data in df_daily.groupby(pd.Grouper(freq="W")):
-                        if not week_data.empty:
-                            bar = type("Bar", (), {
-                                "open": week_data["open"].iloc[0],
-                                "high": week_data["high"].max(),
-                                "low": week_data["low"].min(),
-                                "close": week_data["close"].iloc[-1],
-                                "volume": week_data["volume"].sum(),
-                                "date": week_data.index[-1].strftime("%Y-%m-%d"),
-                            })()
-                            weekly_bars.append(bar)
+        df_hist = (history or HistoryProvider()).daily(sym)
+        if not df_hist.empty:
+            # mesmas 260 sessões que o antigo timeseries=260 trazia
+            df_daily = df_hist.tail(260).set_index("date").sort_index()
+
+            # VS semanal: spot vs última sexta
+            try:
+                last_friday = pd.Timestamp(_last_friday_for_weekly_change(date.today()))
+                s_close = df_daily["close"].dropna()
+                ref = s_close.loc[s_close.index <= last_friday]
+                if not ref.empty:
+                    friday_close = float(ref.iloc[-1])
+                    if friday_close > 0:
+                        vs_pct = (price / friday_close - 1.0) * 100.0
+            except Exception:
+                vs_pct = None
+
+            # gera barras semanais
+            for _, week_data in df_daily.groupby(pd.Grouper(freq="W")):
+                if not week_data.empty:
+                    bar = type("Bar", (), {
+                        "open": week_data["open"].iloc[0],
+                        "high": week_data["high"].max(),
+                        "low": week_data["low"].min(),
+                        "close": week_data["close"].iloc[-1],
+                        "volume": week_data["volume"].sum(),
+                        "date": week_data.index[-1].strftime("%Y-%m-%d"),
+                    })()
+                    weekly_bars.append(bar)
 
         # --- TARGET: payload tem prioridade; se não vier, tenta FMP ---
         final_target = None
@@ -461,7 +574,7 @@ def fetch_equity(
                 vr_pct = None
         else:
             try:
-                res_vr = compute_vr_for_symbol(sym, benchmark="SPY", years=5, min_obs=150)
+                res_vr = compute_vr_for_symbol(sym, benchmark="SPY", years=5, min_obs=150, prices=df_hist)
                 vr_pct = res_vr.get("VR")
             except Exception:
                 vr_pct = None
@@ -472,27 +585,19 @@ def fetch_equity(
         # --- nome e setor ---
         company_name, sector = None, None
         try:
-            r = requests.get(
-                f"https://financialmodelingprep.com/api/v3/profile/{sym}?apikey={FMP_API_KEY}",
-                timeout=20
-            )
-            if r.ok:
-                data = r.json()
-                if isinstance(data, list) and data:
-                    company_name = data[0].get("companyName")
-                    sector = data[0].get("sector")
+            data = fmp.get_json(f"api/v3/profile/{sym}")
+            if isinstance(data, list) and data:
+                company_name = data[0].get("companyName")
+                sector = data[0].get("sector")
         except Exception:
             pass
         if not company_name or not sector:
-            try:
-                info = yf.Ticker(sym).info
-                company_name = company_name or info.get("longName") or info.get("shortName")
-                sector = sector or info.get("sector")
-            except Exception:
-                pass
+            info = guarded_miss("yfinance", "yf:info", sym, lambda: yf.Ticker(sym).info or None) or {}
+            company_name = company_name or info.get("longName") or info.get("shortName")
+            sector = sector or info.get("sector")
 
         # --- crescimento 1y ---
-        _growth_1y = _growth_1y_pct(sym)
+        _growth_1y = _growth_1y_pct(sym, df_hist)
 
         # --- EMAs e gráfico (USAR o mesmo alvo do card) ---
         ema10, ema20, ema200, _ = calculate_technical_indicators(weekly_bars)
@@ -560,9 +665,12 @@ def fetch_crypto(
     target_price: Optional[float] = None,     # pode vir override externo
     expected_growth: Optional[float] = None,
     want_chart: bool = True,
+    quote: Optional[dict] = None,             # linha de /quote já buscada em lote
+    cg_price: Optional[float] = None,         # preço CoinGecko já buscado em lote
+    yahoo: Optional[YahooBatch] = None,       # fallback Yahoo em lote da requisição
 ) -> dict:
     """
-    Preço: FMP -> yfinance -> CoinGecko
+    Preço: FMP (quote em lote, se vier) -> yfinance -> CoinGecko (lote, se vier)
     Gráfico: FMP (histórico diário -> semanal W-FRI) + target
     Retorna:
       - unit_price = preço atual (spot) para o card
@@ -572,75 +680,58 @@ def fetch_crypto(
             (se hoje for sexta, usa a sexta ANTERIOR; senão, a sexta ≤ hoje).
     """
     sym_raw = symbol.strip()
-    sym_fmp = sym_raw.upper().replace("-", "")
-    if not sym_fmp.endswith("USD"):
-        sym_fmp = f"{sym_fmp}USD"  # FMP: BTCUSD
-    sym_yf = sym_raw.upper() if "-" in sym_raw else f"{sym_raw.upper()}-USD"  # yfinance: BTC-USD
+    sym_fmp = crypto_fmp_pair(sym_raw)  # FMP: BTCUSD
+    sym_yf = crypto_yf_symbol(sym_raw)  # yfinance: BTC-USD
+    yahoo = yahoo or YahooBatch([sym_yf])
 
     # -------- helpers de preço "spot" --------
     def _fmp_price() -> Optional[float]:
+        if quote and quote.get("price") is not None:
+            return float(quote["price"])
         api = os.getenv("FMP_API_KEY")
         if not api:
             return None
         try:
-            r = requests.get(
-                f"https://financialmodelingprep.com/api/v3/quote/{sym_fmp}",
-                params={"apikey": api}, timeout=10
-            )
-            if r.ok:
-                data = r.json()
-                if isinstance(data, list) and data and data[0].get("price") is not None:
-                    return float(data[0]["price"])
+            data = get_fmp_client().get_json(f"api/v3/quote/{sym_fmp}", {"apikey": api})
+            if isinstance(data, list) and data and data[0].get("price") is not None:
+                return float(data[0]["price"])
         except Exception:
             pass
         return None
 
-    def _yf_price() -> Optional[float]:
+    def _yf_price_raw() -> Optional[float]:
+        # último fechamento do lote diário (inclui a barra parcial de hoje)
+        lp = yahoo.last_close(sym_yf)
+        if lp is not None:
+            return lp
         t = yf.Ticker(sym_yf)
-        for period, interval in [("2d","1d"),("5d","1d"),("1mo","1d"),("7d","1h")]:
-            try:
-                h = t.history(period=period, interval=interval, auto_adjust=True)
-                if h is not None and not h.empty and "Close" in h:
-                    s = h["Close"].dropna()
-                    if not s.empty:
-                        return float(s.iloc[-1])
-            except Exception:
-                pass
+        last_err: Optional[Exception] = None
         try:
             fi = getattr(t, "fast_info", None)
             lp = getattr(fi, "last_price", None) if fi is not None else None
             if lp is not None:
                 return float(lp)
-        except Exception:
-            pass
+        except Exception as e:
+            last_err = e
         try:
             info = t.info
             rmp = info.get("regularMarketPrice")
             if rmp is not None:
                 return float(rmp)
-        except Exception:
-            pass
+        except Exception as e:
+            last_err = e
+        if last_err is not None:
+            raise last_err   # conta como falha do provedor no circuit breaker
         return None
 
+    def _yf_price() -> Optional[float]:
+        return guarded_miss("yfinance", "yf:price", sym_yf, _yf_price_raw)
+
     def _coingecko_price() -> Optional[float]:
-        mapping = {
-            "BTC-USD": "bitcoin", "ETH-USD": "ethereum",
-            "SOL-USD": "solana",  "ADA-USD": "cardano", "BNB-USD": "binancecoin"
-        }
-        cg_id = mapping.get(sym_yf.upper()) or sym_yf.split("-")[0].lower()
-        try:
-            r = requests.get(
-                "https://api.coingecko.com/api/v3/simple/price",
-                params={"ids": cg_id, "vs_currencies": "usd"},
-                timeout=10
-            )
-            if r.ok:
-                data = r.json()
-                if cg_id in data and "usd" in data[cg_id]:
-                    return float(data[cg_id]["usd"])
-        except Exception:
-            pass
-        return None
+        if cg_price is not None:
+            return float(cg_price)
+        cg_id = coingecko_id(sym_raw)
+        return fetch_coingecko_prices([cg_id]).get(cg_id)
 
     # -------- começa a montar o dict de saída --------
     d: dict[str, Any] = {
@@ -658,10 +749,16 @@ def fetch_crypto(
     }
 
     # -------- preço "spot" (fallback) --------
-    spot_price = _fmp_price() or _yf_price() or _coingecko_price()
+    # corrida "hedged": FMP primeiro; yfinance/CoinGecko entram se ela demorar/falhar
+    spot_price, price_source, price_latency = hedged_first(
+        [("fmp", _fmp_price), ("yfinance", _yf_price), ("coingecko", _coingecko_price)],
+        delay=settings.CRYPTO_PRICE_HEDGE_DELAY,
+    )
     if spot_price is None:
         raise RuntimeError(f"Sem preço disponível para {symbol}")
     d["unit_price"] = float(spot_price)
+    d["price_source"] = price_source
+    d["price_latency_ms"] = price_latency
     # -------- histórico + semanais + indicadores --------
     chart_path = None
     try:
@@ -669,12 +766,11 @@ def fetch_crypto(
         df_daily = _crypto_daily_from_fmp(sym_fmp, years=1)
         if df_daily is None or df_daily.empty:
             # fallback por yfinance
-            t = yf.Ticker(sym_yf)
-            yf_hist = t.history(period="1y", interval="1d", auto_adjust=True)
+            yf_hist = guarded("yfinance", yahoo.history, sym_yf)
             if yf_hist is not None and not yf_hist.empty:
                 df_daily = (
-                    yf_hist.reset_index()[["Date","Close"]]
-                    .rename(columns={"Date":"date","Close":"close"})
+                    yf_hist["Close"].dropna().rename_axis("date").reset_index()
+                    .rename(columns={"Close":"close"})
                 )
             else:
                 raise ValueError("Sem dados diários (último ano).")
@@ -686,16 +782,8 @@ def fetch_crypto(
         if weekly_df is None or weekly_df.empty:
             raise ValueError("Sem dados semanais após o resample.")
 
-        # 3b) sexta de referência para VS: "sexta anterior se hoje for sexta"
-        from datetime import date, timedelta
-        def _last_friday_for_weekly_change(dref: date) -> date:
-            if dref.weekday() == 4:  # sexta
-                dref = dref - timedelta(days=7)
-            while dref.weekday() != 4:
-                dref -= timedelta(days=1)
-            return dref
-
-        ref_friday = _last_friday_for_weekly_change(date.today())
+        # 3b) sexta de referência para VS: "sexta anterior se hoje for sexta" (cripto: 24/7)
+        ref_friday = _last_friday_for_weekly_change(date.today(), crypto=True)
 
         # Normalizar datas para comparação correta
         df_daily["date"] = pd.to_datetime(df_daily["date"]).dt.tz_localize(None).dt.normalize()
@@ -830,12 +918,16 @@ def link_callback(uri, rel, base_url):
 # =========================
 # Builder a partir do payload do front
 # =========================
-def build_report_from_payload(payload: Dict[str, Any]) -> BytesIO:
+@quota_tracked("REPORT")
+@snapshot_scoped
+def build_report_from_payload(payload: Dict[str, Any], max_workers: Optional[int] = None) -> BytesIO:
     """
     Consome o payload canônico do front e gera HTML+PDF.
     Retorna caminho do PDF gerado.
     Espera chaves:
       investor (str), bonds[], stocks[], opp_stocks[], etfs[],etfs_rf[], etfs_op[], etfs_af[], cryptos[], real_estates[]
+    max_workers: limite de símbolos buscados em paralelo (default: settings.REPORT_FETCH_CONCURRENCY).
+    snapshot_id (kw): roda contra um snapshot de mercado ("latest" ou id) em vez da rede.
     """
     investor = payload.get("investor") or "Investidor"
 
@@ -868,57 +960,106 @@ def build_report_from_payload(payload: Dict[str, Any]) -> BytesIO:
             return None
 
 
+    # Cotações de todos os buckets + criptos em poucas chamadas
+    quotes = prefetch_quotes(
+        (it.get("symbol") for b in EQUITY_BUCKETS for it in (payload.get(b) or [])),
+        (c.get("symbol") for c in (payload.get("cryptos") or [])),
+    )
+    # CoinGecko em 1 chamada p/ criptos sem quote da FMP
+    cg_prices = prefetch_crypto_prices((c.get("symbol") for c in (payload.get("cryptos") or [])), quotes)
+    # Histórico diário: 1 busca por símbolo, compartilhada nesta requisição
+    history = HistoryProvider()
+    # Fallback Yahoo: 1 download multi-ticker (só se algum símbolo precisar)
+    yahoo = YahooBatch(
+        [it.get("symbol") for b in EQUITY_BUCKETS for it in (payload.get(b) or [])]
+        + [crypto_yf_symbol(str(c.get("symbol"))) for c in (payload.get("cryptos") or []) if c.get("symbol")]
+    )
+    # Preço-alvo em lote para quem não trouxe alvo no payload
+    targets = prefetch_targets(
+        (it.get("symbol") for b in EQUITY_BUCKETS for it in (payload.get(b) or [])
+         if _num(it.get("target_price")) is None),
+        max_workers=max_workers,
+    )
+    # VR calculado em lote para quem não trouxe VR no payload
+    vr_batch = prefetch_vr(
+        (it.get("symbol") for b in EQUITY_BUCKETS for it in (payload.get(b) or [])
+         if _num(it.get("vr")) is None),
+        history, max_workers=max_workers,
+    )
+
     # Equities e ETFs (buscam dados de mercado)
-    def _mk_equities(items: List[Dict[str, Any]], is_etf: bool, antifragile: bool = False):
-        out = []
-        for it in items or []:
-            sym   = str(it.get("symbol", "")).upper().strip()
-            qty   = _num(it.get("quantity")) or 0.0
-            tp    = _num(it.get("target_price"))
-            score = _num(it.get("score"))
-            vr    = _num(it.get("vr"))   # <<< volatilidade vinda do payload
-            vs    = _num(it.get("vs"))   # <<< valorização semanal (se vier no payload)
-
-            out.append(
-                fetch_equity(
-                    sym, qty,
-                    is_etf=is_etf,
-                    antifragile=antifragile,
-                    target_price=tp,
-                    score=score,
-                    vr=vr,          # <<< passe adiante
-                    vs=vs           # <<< opcional: passe adiante
-                )
-            )
-        return out
-
-    reits = _mk_equities(payload.get("reits"), is_etf=False)
-    stocks = _mk_equities(payload.get("stocks"), is_etf=False)
-    opp_stocks = _mk_equities(payload.get("opp_stocks"), is_etf=False)
-    etfs = _mk_equities(payload.get("etfs"), is_etf=True)
-    etfs_rf = _mk_equities(payload.get("etfs_rf"), is_etf=True)
-    etfs_op = _mk_equities(payload.get("etfs_op"), is_etf=True)
-    etfs_af = _mk_equities(payload.get("etfs_af"), is_etf=True, antifragile=True)
-    hedge = _mk_equities(payload.get("hedge"), is_etf=True)
+    def _equity_task(it: Dict[str, Any], is_etf: bool, antifragile: bool = False):
+        sym   = str(it.get("symbol", "")).upper().strip()
+        qty   = _num(it.get("quantity")) or 0.0
+        tp    = _num(it.get("target_price"))
+        score = _num(it.get("score"))
+        vr    = _num(it.get("vr"))   # <<< volatilidade vinda do payload
+        vs    = _num(it.get("vs"))   # <<< valorização semanal (se vier no payload)
+
+        return partial(
+            fetch_equity,
+            sym, qty,
+            is_etf=is_etf,
+            antifragile=antifragile,
+            target_price=tp if tp is not None else targets.get(sym),
+            score=score,
+            vr=vr if vr is not None else vr_batch.get(sym),  # <<< passe adiante
+            vs=vs,          # <<< opcional: passe adiante
+            quote=quotes.get(sym),
+            history=history,
+            yahoo=yahoo,
+        )
+
+    # Criptos
+    def _crypto_task(c: Dict[str, Any]):
+        c_sym = str(c["symbol"]).upper().strip()
+        return partial(
+            fetch_crypto,
+            symbol=c_sym,
+            quantity=float(c["quantity"]),
+            company_name=c.get("company_name"),
+            expected_growth=float(c["expected_growth"]) if c.get("expected_growth") is not None else None,
+            quote=quotes.get(crypto_fmp_pair(c_sym)),
+            cg_price=cg_prices.get(crypto_fmp_pair(c_sym)),
+            yahoo=yahoo,
+        )
+
+    # (bucket, is_etf, antifragile)
+    bucket_specs = [
+        ("reits", False, False), ("stocks", False, False), ("opp_stocks", False, False),
+        ("etfs", True, False), ("etfs_rf", True, False), ("etfs_op", True, False),
+        ("etfs_af", True, True), ("hedge", True, False),
+    ]
+    jobs: List[tuple] = []  # (bucket, task)
+    for bucket, is_etf, antifragile in bucket_specs:
+        for it in payload.get(bucket) or []:
+            jobs.append((bucket, _equity_task(it, is_etf, antifragile)))
+    for c in payload.get("cryptos") or []:
+        jobs.append(("cryptos", _crypto_task(c)))
+
+    # Fan-out limitado: o tempo total fica perto do símbolo mais lento, não da soma.
+    # run_all preserva a ordem, então cada bucket mantém a ordem do payload.
+    results = run_all((task for _, task in jobs), max_workers=max_workers)
+    grouped: Dict[str, List[Dict[str, Any]]] = {b: [] for b, _, _ in bucket_specs}
+    grouped["cryptos"] = []
+    for (bucket, _), res in zip(jobs, results):
+        grouped[bucket].append(res)
+
+    reits = grouped["reits"]
+    stocks = grouped["stocks"]
+    opp_stocks = grouped["opp_stocks"]
+    etfs = grouped["etfs"]
+    etfs_rf = grouped["etfs_rf"]
+    etfs_op = grouped["etfs_op"]
+    etfs_af = grouped["etfs_af"]
+    hedge = grouped["hedge"]
+    cryptos = grouped["cryptos"]
     raw_liq     = payload.get("liquidity_value", 0.0)                         # ✅ novo
     try:
         liquidity_value = float(raw_liq) if raw_liq is not None else 0.0
     except (TypeError, ValueError):
         liquidity_value = 0.0
 
-    # Criptos
-    cryptos_in = payload.get("cryptos") or []
-    cryptos: List[Dict[str, Any]] = []
-    for c in cryptos_in:
-        cryptos.append(
-            fetch_crypto(
-                symbol=str(c["symbol"]).upper().strip(),
-                quantity=float(c["quantity"]),
-                company_name=c.get("company_name"),
-                expected_growth=float(c["expected_growth"]) if c.get("expected_growth") is not None else None
-            )
-        )
-
     # Imóveis
     real_estates_in = payload.get("real_estates") or []
     real_estates: List[Dict[str, Any]] = []
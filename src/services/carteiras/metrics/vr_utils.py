@@ -1,47 +1,33 @@
 # src/services/carteiras/metrics/vr_utils.py
 from __future__ import annotations
 
-import os, math, time
-from typing import List, Optional, Dict
+import math
+import threading
+from datetime import date, timedelta
+from typing import List, Optional, Dict, Tuple
 import numpy as np
 import pandas as pd
-import requests
 
-FMP_API = os.getenv("FMP_API_KEY")
-FMP_V3 = "https://financialmodelingprep.com/api/v3"
-FMP_STABLE = "https://financialmodelingprep.com/stable"
+from src.services.carteiras.fmp.client import get_fmp_client
+from src.services.carteiras.fmp.history import load_daily_history
+from src.services.carteiras.concurrency import map_bounded
+
+FMP_V3 = "api/v3"
+FMP_STABLE = "stable"
 
 # -------------------- HTTP util --------------------
-def _get(url: str, params: Optional[Dict] = None, tries: int = 3, backoff: float = 1.5):
-    params = dict(params or {})
-    if FMP_API:
-        params["apikey"] = FMP_API
-    last = None
-    for i in range(tries):
-        try:
-            r = requests.get(url, params=params, timeout=20)
-            if r.status_code == 200:
-                return r.json()
-            last = RuntimeError(f"HTTP {r.status_code}: {r.text[:200]}")
-        except Exception as e:
-            last = e
-        time.sleep(backoff ** (i + 1))
-    raise last
+def _get(path: str, params: Optional[Dict] = None):
+    """GET na FMP via cliente compartilhado (retry/backoff ficam no cliente)."""
+    return get_fmp_client().get_json(path, params)
 
 # -------------------- Data fetch --------------------
 def fetch_prices(symbol: str, start: str, end: str) -> pd.DataFrame:
-    """Baixa preços históricos (close/adjClose) do símbolo [start, end]."""
-    js = _get(f"{FMP_V3}/historical-price-full/{symbol}", {"from": start, "to": end})
-    hist = js.get("historical") if isinstance(js, dict) else js
-    df = pd.DataFrame(hist or [])
+    """Preços históricos (close/adjClose) do símbolo [start, end], via store local de histórico."""
+    df = load_daily_history(symbol, start, end)
     if df.empty:
         return pd.DataFrame(columns=["date","close","adjClose","volume"])
-    keep = [c for c in df.columns if c in {"date","close","adjClose","unadjustedClose","volume"}]
-    df = df[keep].copy()
-    if "adjClose" not in df.columns and "unadjustedClose" in df.columns:
-        df.rename(columns={"unadjustedClose": "close"}, inplace=True)
-    df["date"] = pd.to_datetime(df["date"])
-    return df.sort_values("date").reset_index(drop=True)
+    keep = [c for c in df.columns if c in {"date","close","adjClose","volume"}]
+    return df[keep].sort_values("date").reset_index(drop=True)
 
 def fetch_splits(symbol: str, start: str, end: str) -> pd.DataFrame:
     """Baixa splits (numerator/denominator) e calcula ratio_float."""
@@ -66,14 +52,20 @@ def backadjust_adjclose(df_price: pd.DataFrame, df_splits: pd.DataFrame) -> pd.S
     if df_price.empty:
         return pd.Series(dtype=float)
     adj = df_price["close"].astype(float).copy()
-    if not df_splits.empty:
-        for _, row in df_splits.dropna(subset=["ratio_float"]).iterrows():
-            ratio = float(row["ratio_float"])
-            if ratio <= 0 or np.isnan(ratio):
-                continue
-            d = row["date"]
-            adj.loc[df_price["date"] < d] *= (1.0 / ratio)
-    return adj
+    if df_splits.empty:
+        return adj
+    ratio = df_splits["ratio_float"].to_numpy(dtype=float)
+    ok = ratio > 0   # descarta NaN e ratios inválidos
+    if not ok.any():
+        return adj
+    split_dates = df_splits["date"].to_numpy(dtype="datetime64[ns]")[ok]
+    order = np.argsort(split_dates, kind="stable")
+    split_dates, inv = split_dates[order], 1.0 / ratio[ok][order]
+    # fator de cada barra = produto de 1/ratio dos splits POSTERIORES a ela:
+    # sufixo acumulado + searchsorted (1 passada, 1 multiplicação)
+    suffix = np.append(np.cumprod(inv[::-1])[::-1], 1.0)
+    pos = np.searchsorted(split_dates, df_price["date"].to_numpy(dtype="datetime64[ns]"), side="right")
+    return adj * suffix[pos]
 
 def build_returns(df_price: pd.DataFrame, adj: pd.Series, split_dates: List[pd.Timestamp]) -> pd.DataFrame:
     """Retornos log; zera dias de split e outliers extremos."""
@@ -121,32 +113,70 @@ def pick_benchmark(group: str) -> str:
         return "VNQ"
     return "SPY"
 
-def compute_vr_for_symbol(symbol: str, benchmark: Optional[str] = None,
-                          years: int = 5, min_obs: int = 150) -> Dict[str, float]:
+# Retornos do benchmark: 1 cálculo por (benchmark, janela, dia), compartilhado
+# entre símbolos e requisições. A chave inclui o dia -> renova no pregão seguinte.
+_BENCH_CACHE: Dict[Tuple[str, int, str], pd.DataFrame] = {}
+_BENCH_LOCK = threading.Lock()
+
+def benchmark_returns(bench: str, years: int = 5) -> pd.DataFrame:
+    """Retornos log (date/adj/r) do benchmark nos últimos `years` anos, já ajustados por splits."""
+    today = date.today()
+    key = (bench.upper(), years, today.isoformat())
+    df_b = _BENCH_CACHE.get(key)
+    if df_b is not None:
+        return df_b
+    with _BENCH_LOCK:
+        df_b = _BENCH_CACHE.get(key)
+        if df_b is None:
+            start = (today - timedelta(days=int(365.25 * years))).isoformat()
+            end = today.isoformat()
+            p_b = fetch_prices(bench, start, end)
+            s_b = fetch_splits(bench, "1900-01-01", end)
+            adj_b = backadjust_adjclose(p_b, s_b)
+            df_b = build_returns(p_b, adj_b, s_b["date"].tolist())
+            if df_b.empty:
+                return df_b  # falha na busca: não fixa o vazio no cache
+            # descarta dias anteriores
+            for k in [k for k in _BENCH_CACHE if k[2] != key[2]]:
+                _BENCH_CACHE.pop(k, None)
+            _BENCH_CACHE[key] = df_b
+    return df_b
+
+def asset_returns(symbol: str, years: int = 5, prices: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
-    Calcula DERI/MEVAR/VR para um único símbolo vs benchmark (default SPY).
-    Retorna: {"symbol","benchmark","DERI","MEVAR","VR"}
+    Retornos log (date/adj/r) do ativo na janela de `years` anos.
+    prices: histórico diário já carregado (date/close/adjClose), ex. do HistoryProvider;
+            quando vier, o ativo não é buscado de novo.
     """
-    from datetime import date, timedelta
     today = date.today()
     start = (today - timedelta(days=int(365.25 * years))).isoformat()
     end   = today.isoformat()
+    if prices is not None and not prices.empty:
+        keep = [c for c in prices.columns if c in {"date","close","adjClose","volume"}]
+        p = prices.loc[prices["date"] >= pd.to_datetime(start), keep].reset_index(drop=True)
+    else:
+        p = fetch_prices(symbol, start, end)
+        if p.empty or (p["date"].min() > pd.to_datetime(start) + pd.Timedelta(days=60)):
+            p = fetch_prices(symbol, "1900-01-01", end)
+    s = fetch_splits(symbol, "1900-01-01", end)
+    adj = backadjust_adjclose(p, s)
+    return build_returns(p, adj, s["date"].tolist())
 
+def compute_vr_for_symbol(symbol: str, benchmark: Optional[str] = None,
+                          years: int = 5, min_obs: int = 150,
+                          prices: Optional[pd.DataFrame] = None) -> Dict[str, float]:
+    """
+    Calcula DERI/MEVAR/VR para um único símbolo vs benchmark (default SPY).
+    prices: histórico diário do ativo já carregado (ver asset_returns).
+    Retorna: {"symbol","benchmark","DERI","MEVAR","VR"}
+    """
     bench = benchmark or pick_benchmark("default")
 
-    # Benchmark
-    p_b = fetch_prices(bench, start, end)
-    s_b = fetch_splits(bench, "1900-01-01", end)
-    adj_b = backadjust_adjclose(p_b, s_b)
-    df_b = build_returns(p_b, adj_b, s_b["date"].tolist())
+    # Benchmark (cache diário compartilhado)
+    df_b = benchmark_returns(bench, years)
 
     # Ativo
-    p = fetch_prices(symbol, start, end)
-    if p.empty or (p["date"].min() > pd.to_datetime(start) + pd.Timedelta(days=60)):
-        p = fetch_prices(symbol, "1900-01-01", end)
-    s = fetch_splits(symbol, "1900-01-01", end)
-    adj = backadjust_adjclose(p, s)
-    df_a = build_returns(p, adj, s["date"].tolist())
+    df_a = asset_returns(symbol, years, prices)
 
     df_m = (
         pd.merge(
@@ -163,3 +193,69 @@ def compute_vr_for_symbol(symbol: str, benchmark: Optional[str] = None,
     mevar = compute_mevar(df_m["r_a"], df_m["r_b"])
     vr    = calculate_vr(deri, mevar)
     return {"symbol": symbol.upper(), "benchmark": bench, "DERI": round(deri, 4), "MEVAR": round(mevar, 4), "VR": vr}
+
+# -------------------- Batch (vetorizado) --------------------
+def calculate_vr_array(deri: np.ndarray, mevar: np.ndarray) -> np.ndarray:
+    """calculate_vr coluna a coluna (mesma fórmula logística; NaN onde faltar dado)."""
+    ln_1_5 = math.log(1.5)
+    with np.errstate(over="ignore", invalid="ignore"):
+        deri_part  = 2.5 * (100 / (1 + np.exp(-(ln_1_5/0.35) * (deri  - 1.15))))
+        mevar_part = 2.0 * (100 / (1 + np.exp(-(ln_1_5/0.25) * (mevar - 0.75))))
+    return np.round((deri_part + mevar_part) / 4.5, 2)
+
+def compute_vr_batch(symbols: List[str], benchmark: Optional[str] = None,
+                     years: int = 5, min_obs: int = 150,
+                     prices: Optional[Dict[str, pd.DataFrame]] = None,
+                     max_workers: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """
+    DERI/MEVAR/VR de vários símbolos contra o mesmo benchmark numa única passada:
+    os retornos viram uma matriz (datas do benchmark x símbolos) e vol/média abs
+    são calculadas por coluna, só nas datas em que ativo e benchmark têm retorno
+    (igual ao merge inner de compute_vr_for_symbol).
+    prices: {SYMBOL: histórico diário já carregado}; os demais são buscados em paralelo.
+    Retorna {SYMBOL: {"symbol","benchmark","DERI","MEVAR","VR"}}.
+    """
+    bench = benchmark or pick_benchmark("default")
+    syms = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    if not syms:
+        return {}
+    prices = {k.upper(): v for k, v in (prices or {}).items()}
+
+    df_b = benchmark_returns(bench, years)
+    frames = map_bounded(lambda s: asset_returns(s, years, prices.get(s)), syms, max_workers=max_workers)
+
+    # matriz de retornos alinhada às datas do benchmark (NaN = sem retorno no dia)
+    idx = pd.DatetimeIndex(df_b["date"])
+    R = np.column_stack([
+        f.drop_duplicates("date").set_index("date")["r"].reindex(idx).to_numpy(dtype=float)
+        if not f.empty else np.full(len(idx), np.nan)
+        for f in frames
+    ]) if len(idx) else np.empty((0, len(syms)))
+    rb = df_b["r"].to_numpy(dtype=float)[:, None]
+
+    M = ~np.isnan(R) & ~np.isnan(rb)
+    n = M.sum(axis=0)
+    A = np.where(M, R, 0.0)
+    B = np.where(M, rb, 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_a = A.sum(axis=0) / n
+        mean_b = B.sum(axis=0) / n
+        vol_a = np.sqrt((np.where(M, A - mean_a, 0.0) ** 2).sum(axis=0) / (n - 1))
+        vol_b = np.sqrt((np.where(M, B - mean_b, 0.0) ** 2).sum(axis=0) / (n - 1))
+        deri  = vol_a / vol_b
+        mevar = (np.abs(A).sum(axis=0) / n) / (np.abs(B).sum(axis=0) / n)
+        deri  = np.where(n >= max(min_obs, 2), deri, np.nan)
+        mevar = np.where(n >= max(min_obs, 1), mevar, np.nan)
+    vr = calculate_vr_array(deri, mevar)
+
+    out: Dict[str, Dict[str, float]] = {}
+    for j, sym in enumerate(syms):
+        ok = not (np.isnan(deri[j]) or np.isnan(mevar[j]))
+        out[sym] = {
+            "symbol": sym, "benchmark": bench,
+            "DERI": round(float(deri[j]), 4) if ok else np.nan,
+            "MEVAR": round(float(mevar[j]), 4) if ok else np.nan,
+            "VR": float(vr[j]) if ok else np.nan,
+        }
+    return out
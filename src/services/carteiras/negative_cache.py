@@ -0,0 +1,99 @@
+# src/services/carteiras/negative_cache.py
+from __future__ import annotations
+import threading, time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from src.config.settings import settings
+from src.services.carteiras.circuit import guarded
+
+R = TypeVar("R")
+
+# TTL (s) por tipo de dado; demais usam settings.NEGATIVE_CACHE_TTL_SECONDS
+KIND_TTLS: Dict[str, float] = {
+    "fmp:profile": 7 * 86400,
+}
+
+class NegativeCache:
+    """
+    Lembra consultas que voltaram vazias por (tipo de dado, símbolo) durante um TTL,
+    p/ que símbolos sabidamente sem perfil/dividendos/alvo/dado no Yahoo não voltem
+    à rede a cada relatório. Falhas (exceções) não entram aqui: só respostas vazias.
+    """
+
+    def __init__(self, default_ttl: Optional[float] = None, kind_ttls: Optional[Dict[str, float]] = None):
+        self.default_ttl = settings.NEGATIVE_CACHE_TTL_SECONDS if default_ttl is None else default_ttl
+        self.kind_ttls = {**KIND_TTLS, **(kind_ttls or {})}
+        self._entries: Dict[Tuple[str, str], Tuple[float, float]] = {}   # -> (marcado_em, expira_em)
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    @staticmethod
+    def _key(kind: str, symbol: str) -> Tuple[str, str]:
+        return (kind, (symbol or "").strip().upper())
+
+    def is_missing(self, kind: str, symbol: str) -> bool:
+        key = self._key(kind, symbol)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return False
+            if item[1] <= time.time():
+                del self._entries[key]
+                return False
+            self.hits += 1
+            return True
+
+    def mark_missing(self, kind: str, symbol: str) -> None:
+        ttl = self.kind_ttls.get(kind, self.default_ttl)
+        if ttl <= 0 or not symbol:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[self._key(kind, symbol)] = (now, now + ttl)
+
+    def clear(self, kind: Optional[str] = None, symbol: Optional[str] = None) -> int:
+        """Remove entradas (filtrando por tipo e/ou símbolo). Retorna quantas saíram."""
+        sym = (symbol or "").strip().upper() or None
+        with self._lock:
+            keys = [k for k in self._entries
+                    if (kind is None or k[0] == kind) and (sym is None or k[1] == sym)]
+            for k in keys:
+                del self._entries[k]
+        return len(keys)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        iso = lambda t: datetime.fromtimestamp(t, tz=timezone.utc).isoformat(timespec="seconds")
+        with self._lock:
+            live = sorted((k, v) for k, v in self._entries.items() if v[1] > now)
+        return [{"kind": k[0], "symbol": k[1], "marked_at": iso(v[0]), "expires_at": iso(v[1])}
+                for k, v in live]
+
+# ---------- Instância do processo ----------
+_cache = NegativeCache()
+
+def get_negative_cache() -> NegativeCache:
+    return _cache
+
+def remember_miss(kind: str, symbol: str, fn: Callable[..., Optional[R]], *args, **kwargs) -> Optional[R]:
+    """
+    Executa fn (a consulta) a menos que (kind, symbol) esteja marcado como vazio.
+    Resultado None marca o miss; exceções sobem sem marcar (p/ o circuit breaker).
+    """
+    if _cache.is_missing(kind, symbol):
+        return None
+    result = fn(*args, **kwargs)
+    if result is None:
+        _cache.mark_missing(kind, symbol)
+    return result
+
+def guarded_miss(provider: str, kind: str, symbol: str, fn: Callable[..., Optional[R]], *args, **kwargs) -> Optional[R]:
+    """
+    remember_miss sob o circuit breaker de `provider`, com o negative cache checado
+    ANTES do breaker: miss já conhecido não conta como chamada, sucesso ou prova
+    (half-open) do provedor — só consultas reais passam pelo breaker.
+    """
+    if _cache.is_missing(kind, symbol):
+        return None
+    return guarded(provider, remember_miss, kind, symbol, fn, *args, **kwargs)
@@ -0,0 +1,324 @@
+# src/services/carteiras/snapshot.py
+from __future__ import annotations
+import functools, gzip, json, logging, os, re, threading, uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, TypeVar
+
+import pandas as pd
+
+from src.config.settings import settings
+from src.services.carteiras.fmp.client import get_fmp_client, pinned_responses
+
+log = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Aliases de cripto no notes.json (o resto do universo é equity/ETF)
+CRYPTO_ALIASES = {"BTC": "BTC", "BTC-USD": "BTC", "BTCUSD": "BTC"}
+BENCHMARKS = ("SPY", "VNQ")
+
+# Formato gerado por build_snapshot; qualquer outro id é recusado (vira caminho em disco)
+SNAPSHOT_ID_RE = re.compile(r"^\d{8}T\d{6}Z-[0-9a-f]{6}$")
+SNAPSHOT_SUFFIX = ".json.gz"
+
+class SnapshotNotFound(LookupError):
+    pass
+
+# ---------- Modelo ----------
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """
+    Foto imutável e versionada dos dados de mercado de um universo de símbolos:
+    quotes, histórico diário, alvos, VR e respostas FMP por símbolo
+    (perfil, dividendos) + calendário de balanços do mês.
+    Relatórios rodando sob use_snapshot() leem daqui em vez da rede.
+    """
+    snapshot_id: str
+    created_at: str
+    universe: Tuple[str, ...]
+    cryptos: Tuple[str, ...]
+    history_start: str
+    quotes: Mapping[str, dict] = field(default_factory=dict)
+    history: Mapping[str, pd.DataFrame] = field(default_factory=dict)
+    targets: Mapping[str, float] = field(default_factory=dict)
+    vr: Mapping[str, float] = field(default_factory=dict)
+    responses: Mapping[tuple, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        for name in ("quotes", "history", "targets", "vr", "responses"):
+            object.__setattr__(self, name, MappingProxyType(dict(getattr(self, name))))
+
+    def to_json(self) -> Dict[str, Any]:
+        """Forma serializável em JSON (DataFrames -> colunas/linhas, chaves de resposta -> listas)."""
+        def _frame(df: pd.DataFrame) -> Dict[str, Any]:
+            out = df.copy()
+            if "date" in out:
+                out["date"] = pd.to_datetime(out["date"]).dt.strftime("%Y-%m-%d")
+            return {"columns": list(out.columns), "data": out.astype(object).where(out.notna(), None).values.tolist()}
+
+        return {
+            "snapshot_id": self.snapshot_id,
+            "created_at": self.created_at,
+            "universe": list(self.universe),
+            "cryptos": list(self.cryptos),
+            "history_start": self.history_start,
+            "quotes": dict(self.quotes),
+            "history": {sym: _frame(df) for sym, df in self.history.items()},
+            "targets": dict(self.targets),
+            "vr": dict(self.vr),
+            "responses": [[path, [list(kv) for kv in items], data]
+                          for (path, items), data in self.responses.items()],
+        }
+
+    @classmethod
+    def from_json(cls, js: Dict[str, Any]) -> "MarketSnapshot":
+        def _frame(d: Dict[str, Any]) -> pd.DataFrame:
+            df = pd.DataFrame(d.get("data") or [], columns=d.get("columns") or [])
+            if "date" in df:
+                df["date"] = pd.to_datetime(df["date"])
+            return df
+
+        return cls(
+            snapshot_id=js["snapshot_id"],
+            created_at=js["created_at"],
+            universe=tuple(js.get("universe") or ()),
+            cryptos=tuple(js.get("cryptos") or ()),
+            history_start=js["history_start"],
+            quotes=js.get("quotes") or {},
+            history={sym: _frame(d) for sym, d in (js.get("history") or {}).items()},
+            targets=js.get("targets") or {},
+            vr=js.get("vr") or {},
+            responses={(path, tuple(tuple(kv) for kv in items)): data
+                       for path, items, data in js.get("responses") or []},
+        )
+
+    def history_slice(self, symbol: str, start: str, end: str) -> Optional[pd.DataFrame]:
+        """Janela [start, end] do histórico, ou None se o snapshot não cobre (símbolo/início)."""
+        df = self.history.get((symbol or "").strip().upper())
+        if df is None or start < self.history_start:
+            return None
+        mask = (df["date"] >= pd.Timestamp(start)) & (df["date"] <= pd.Timestamp(end))
+        return df.loc[mask].reset_index(drop=True)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "snapshot_id": self.snapshot_id,
+            "created_at": self.created_at,
+            "symbols": len(self.universe),
+            "cryptos": list(self.cryptos),
+            "quotes": len(self.quotes),
+            "history": sum(1 for df in self.history.values() if not df.empty),
+            "targets": len(self.targets),
+            "vr": len(self.vr),
+            "responses": len(self.responses),
+        }
+
+# ---------- Snapshot ativo no contexto ----------
+_active: ContextVar[Optional[MarketSnapshot]] = ContextVar("market_snapshot", default=None)
+
+def active_snapshot() -> Optional[MarketSnapshot]:
+    return _active.get()
+
+@contextmanager
+def use_snapshot(snapshot_id: Optional[str]) -> Iterator[Optional[MarketSnapshot]]:
+    """Roda o bloco contra o snapshot (id ou "latest"); None = dados ao vivo."""
+    if not snapshot_id:
+        yield None
+        return
+    snap = get_snapshot(snapshot_id)
+    token = _active.set(snap)
+    try:
+        with pinned_responses(snap.responses):
+            yield snap
+    finally:
+        _active.reset(token)
+
+def snapshot_scoped(fn: F) -> F:
+    """Decorator: aceita `snapshot_id=` e roda a função sob use_snapshot(snapshot_id)."""
+    @functools.wraps(fn)
+    def wrapper(*args, snapshot_id: Optional[str] = None, **kwargs):
+        with use_snapshot(snapshot_id):
+            return fn(*args, **kwargs)
+    return wrapper  # type: ignore[return-value]
+
+# ---------- Registro (memória + disco) ----------
+_snapshots: Dict[str, MarketSnapshot] = {}
+_lock = threading.Lock()
+
+def _check_id(snapshot_id: str) -> str:
+    if not isinstance(snapshot_id, str) or not SNAPSHOT_ID_RE.match(snapshot_id):
+        raise SnapshotNotFound(f"snapshot id inválido: {snapshot_id!r}")
+    return snapshot_id
+
+def _path(snapshot_id: str) -> str:
+    return os.path.join(settings.SNAPSHOT_DIR, _check_id(snapshot_id) + SNAPSHOT_SUFFIX)
+
+def _save(snap: MarketSnapshot) -> None:
+    os.makedirs(settings.SNAPSHOT_DIR, mode=0o700, exist_ok=True)
+    tmp = _path(snap.snapshot_id) + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(snap.to_json(), f)
+    os.replace(tmp, _path(snap.snapshot_id))
+
+def _stored_ids() -> List[str]:
+    try:
+        names = os.listdir(settings.SNAPSHOT_DIR)
+    except FileNotFoundError:
+        return []
+    ids = (n[:-len(SNAPSHOT_SUFFIX)] for n in names if n.endswith(SNAPSHOT_SUFFIX))
+    return sorted(i for i in ids if SNAPSHOT_ID_RE.match(i))
+
+def _prune() -> None:
+    keep = max(1, settings.SNAPSHOT_KEEP)
+    for sid in _stored_ids()[:-keep]:
+        _snapshots.pop(sid, None)
+        try:
+            os.remove(_path(sid))
+        except OSError:
+            pass
+
+def list_snapshots() -> List[str]:
+    """Ids disponíveis (mais antigo -> mais novo). Ids ordenam pela data de criação."""
+    with _lock:
+        return sorted(set(_stored_ids()) | set(_snapshots))
+
+def get_snapshot(snapshot_id: str) -> MarketSnapshot:
+    with _lock:
+        if snapshot_id == "latest":
+            ids = sorted(set(_stored_ids()) | set(_snapshots))
+            if not ids:
+                raise SnapshotNotFound("nenhum snapshot disponível")
+            snapshot_id = ids[-1]
+        snap = _snapshots.get(_check_id(snapshot_id))
+        if snap is None:
+            try:
+                with gzip.open(_path(snapshot_id), "rt", encoding="utf-8") as f:
+                    snap = MarketSnapshot.from_json(json.load(f))
+            except FileNotFoundError:
+                raise SnapshotNotFound(f"snapshot {snapshot_id!r} não encontrado") from None
+            _snapshots[snapshot_id] = snap
+        return snap
+
+# ---------- Construção ----------
+def default_universe() -> List[str]:
+    """Tickers do notes.json da assembleia (+ benchmarks do VR), ou SNAPSHOT_UNIVERSE."""
+    if settings.SNAPSHOT_UNIVERSE:
+        syms = settings.SNAPSHOT_UNIVERSE.split(",")
+    else:
+        path = os.path.join(os.path.dirname(__file__), "assembleia", "notes.json")
+        with open(path, "r", encoding="utf-8") as f:
+            syms = list(json.load(f) or {})
+    return list(dict.fromkeys(s.strip().upper() for s in [*syms, *BENCHMARKS] if s and s.strip()))
+
+def build_snapshot(universe: Optional[Iterable[str]] = None, max_workers: Optional[int] = None) -> MarketSnapshot:
+    """
+    Busca quotes, histórico, alvos, VR, perfil, dividendos e balanços do mês do
+    universo e grava um snapshot novo (imutável). Reaproveita os mesmos caminhos
+    de busca dos relatórios (lote, store local, cache, rate limit).
+    """
+    from src.services.carteiras.concurrency import map_bounded
+    from src.services.carteiras.fmp.history import DEFAULT_HISTORY_YEARS, HistoryProvider
+    from src.services.carteiras.make_report import (
+        crypto_fmp_pair, prefetch_quotes, prefetch_targets, prefetch_vr,
+    )
+    from src.services.carteiras.assembleia.prep import _earning_calendar_month
+
+    syms = list(dict.fromkeys(s.strip().upper() for s in (universe or default_universe()) if s and s.strip()))
+    cryptos = sorted({CRYPTO_ALIASES[s] for s in syms if s in CRYPTO_ALIASES})
+    equities = [s for s in syms if s not in CRYPTO_ALIASES]
+    pairs = [crypto_fmp_pair(c) for c in cryptos]
+
+    now = datetime.now(timezone.utc)
+    snapshot_id = f"{now:%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:6]}"
+    history_start = (date.today() - timedelta(days=int(365.25 * DEFAULT_HISTORY_YEARS))).isoformat()
+    log.info("[SNAPSHOT] %s: construindo (%d equities, %d criptos)", snapshot_id, len(equities), len(cryptos))
+
+    quotes = prefetch_quotes(equities, cryptos)
+    provider = HistoryProvider()
+    frames = map_bounded(provider.daily, equities + pairs, max_workers=max_workers)
+    history = dict(zip(equities + pairs, frames))
+    targets = prefetch_targets(equities, max_workers=max_workers)
+    vr = prefetch_vr(equities, provider, max_workers=max_workers)
+
+    # respostas por símbolo, com a mesma chave usada pelos call sites (apikey fora da chave)
+    fmp = get_fmp_client()
+    paths = [p for s in equities for p in (f"api/v3/profile/{s}",
+                                              f"api/v3/historical-price-full/stock_dividend/{s}")]
+
+    def _fetch(path: str):
+        try:
+            return path, fmp.get_json(path)
+        except Exception as e:
+            log.warning("[SNAPSHOT] %s falhou: %s", path, e)
+            return path, None
+
+    responses: Dict[tuple, Any] = {
+        fmp.cache_key(path): data
+        for path, data in map_bounded(_fetch, paths, max_workers=max_workers) if data
+    }
+    today = date.today()
+    try:
+        cal = _earning_calendar_month(today.year, today.month)
+        d0 = date(today.year, today.month, 1)
+        d1 = (d0 + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        responses[fmp.cache_key("api/v3/earning_calendar", {"from": d0.isoformat(), "to": d1.isoformat()})] = cal
+    except Exception as e:
+        log.warning("[SNAPSHOT] calendário de balanços falhou: %s", e)
+
+    snap = MarketSnapshot(
+        snapshot_id=snapshot_id,
+        created_at=now.isoformat(timespec="seconds"),
+        universe=tuple(syms),
+        cryptos=tuple(cryptos),
+        history_start=history_start,
+        quotes=quotes,
+        history=history,
+        targets=targets,
+        vr={k: v for k, v in vr.items() if v is not None},
+        responses=responses,
+    )
+    with _lock:
+        _snapshots[snapshot_id] = snap
+        try:
+            _save(snap)
+        except OSError as e:
+            log.warning("[SNAPSHOT] não foi possível gravar %s em disco: %s", snapshot_id, e)
+        _prune()
+    log.info("[SNAPSHOT] pronto: %s", snap.summary())
+    return snap
+
+# ---------- Agendamento (processo de longa duração: uvicorn no EC2) ----------
+_scheduler: Optional[threading.Thread] = None
+_scheduler_stop = threading.Event()
+
+def _schedule_loop(interval: float) -> None:
+    while not _scheduler_stop.is_set():
+        try:
+            build_snapshot()
+        except Exception as e:
+            log.error("[SNAPSHOT] construção agendada falhou: %s", e)
+        _scheduler_stop.wait(interval)
+
+def start_snapshot_scheduler(interval: Optional[float] = None) -> bool:
+    """
+    Constrói um snapshot já e depois a cada `interval` s (SNAPSHOT_SCHEDULE_SECONDS)
+    numa thread daemon. interval <= 0 desliga. Retorna se o agendador está rodando.
+    """
+    global _scheduler
+    interval = settings.SNAPSHOT_SCHEDULE_SECONDS if interval is None else interval
+    if interval <= 0:
+        return False
+    if _scheduler is None or not _scheduler.is_alive():
+        _scheduler_stop.clear()
+        _scheduler = threading.Thread(target=_schedule_loop, args=(interval,),
+                                      name="snapshot-scheduler", daemon=True)
+        _scheduler.start()
+        log.info("[SNAPSHOT] agendador ligado: a cada %.0fs", interval)
+    return True
+
+def stop_snapshot_scheduler() -> None:
+    _scheduler_stop.set()
@@ -0,0 +1,142 @@
+# src/services/carteiras/trading_calendar.py
+from __future__ import annotations
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import List, Optional
+
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr,
+    USMemorialDay, USPresidentsDay, USThanksgivingDay, nearest_workday, sunday_to_monday,
+)
+
+FRIDAY = 4
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    """Feriados regulares da NYSE (fechamento o dia todo)."""
+    rules = [
+        # Ano-novo no sábado não é compensado na sexta (31/12 abre)
+        Holiday("NewYearsDay", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("IndependenceDay", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas", month=12, day=25, observance=nearest_workday),
+    ]
+
+# Fechamentos extraordinários (11/set, lutos nacionais, furacão Sandy)
+NYSE_SPECIAL_CLOSURES = (
+    date(2001, 9, 11), date(2001, 9, 12), date(2001, 9, 13), date(2001, 9, 14),
+    date(2004, 6, 11), date(2007, 1, 2), date(2012, 10, 29), date(2012, 10, 30),
+    date(2018, 12, 5), date(2025, 1, 9),
+)
+
+class TradingCalendar:
+    """
+    Índice ordenado dos pregões da NYSE, pré-calculado por regra (sem rede).
+    Responde "último pregão <= data" em O(log n) via bisect; a faixa de anos
+    cresce sob demanda se a consulta sair dela. A lista nova é montada fora
+    e trocada junto com a faixa, numa tupla só: leitores nunca veem faixa
+    nova com lista velha.
+    """
+
+    def __init__(self, first_year: int = 2000, last_year: Optional[int] = None):
+        self._lock = threading.Lock()
+        last_year = last_year or date.today().year + 1
+        self._state = (first_year, last_year, self._build(first_year, last_year))
+
+    @staticmethod
+    def _build(first_year: int, last_year: int) -> List[date]:
+        start, end = date(first_year, 1, 1), date(last_year, 12, 31)
+        holidays = set(NYSEHolidayCalendar().holidays(start, end).date)
+        holidays.update(d for d in NYSE_SPECIAL_CLOSURES if start <= d <= end)
+        return [d for d in pd.bdate_range(start, end).date if d not in holidays]
+
+    @property
+    def first_year(self) -> int:
+        return self._state[0]
+
+    @property
+    def last_year(self) -> int:
+        return self._state[1]
+
+    def _cover(self, d: date) -> List[date]:
+        """Pregões cobrindo o ano de d (amplia a faixa se preciso)."""
+        first, last, sessions = self._state
+        if first <= d.year <= last:
+            return sessions
+        with self._lock:
+            first, last, sessions = self._state
+            if not (first <= d.year <= last):
+                first, last = min(first, d.year), max(last, d.year)
+                sessions = self._build(first, last)
+                self._state = (first, last, sessions)
+            return sessions
+
+    def is_session(self, d: date) -> bool:
+        sessions = self._cover(d)
+        i = bisect_left(sessions, d)
+        return i < len(sessions) and sessions[i] == d
+
+    def last_session(self, d: date) -> date:
+        """Último pregão <= d."""
+        sessions = self._cover(d)
+        i = bisect_right(sessions, d)
+        if i == 0:
+            self._cover(date(d.year - 1, 1, 1))
+            return self.last_session(d)
+        return sessions[i - 1]
+
+    def previous_session(self, d: date) -> date:
+        """Último pregão < d."""
+        return self.last_session(d - timedelta(days=1))
+
+    def sessions_between(self, start: date, end: date) -> List[date]:
+        """Pregões em [start, end] (crescente)."""
+        self._cover(start)
+        sessions = self._cover(end)   # a faixa só cresce: cobre start e end
+        return sessions[bisect_left(sessions, start):bisect_right(sessions, end)]
+
+    def weekly_reference(self, d: date) -> date:
+        """
+        "Sexta de referência" p/ variação semanal: sexta anterior se d for sexta,
+        senão a sexta <= d; caindo em feriado, o pregão anterior a ela.
+        """
+        back = (d.weekday() - FRIDAY) % 7 or 7
+        return self.last_session(d - timedelta(days=back))
+
+class ContinuousCalendar(TradingCalendar):
+    """Mercado 24/7 (cripto): todo dia é pregão."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def is_session(self, d: date) -> bool:
+        return True
+
+    def last_session(self, d: date) -> date:
+        return d
+
+    def sessions_between(self, start: date, end: date) -> List[date]:
+        return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+# ---------- Instâncias do processo ----------
+_nyse: Optional[TradingCalendar] = None
+_nyse_lock = threading.Lock()
+_crypto = ContinuousCalendar()
+
+def get_calendar(crypto: bool = False) -> TradingCalendar:
+    """Calendário NYSE (equities/ETFs/REITs) ou 24/7 (crypto=True)."""
+    global _nyse
+    if crypto:
+        return _crypto
+    if _nyse is None:
+        with _nyse_lock:
+            if _nyse is None:
+                _nyse = TradingCalendar()
+    return _nyse
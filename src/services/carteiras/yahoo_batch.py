@@ -0,0 +1,97 @@
+# src/services/carteiras/yahoo_batch.py
+from __future__ import annotations
+import logging, threading
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import yfinance as yf
+
+log = logging.getLogger(__name__)
+
+class YahooBatch:
+    """
+    Fallback Yahoo de uma requisição: na 1ª vez que algum símbolo precisa do Yahoo,
+    baixa TODOS os símbolos registrados num único yf.download multi-ticker
+    (diário, `period`, com actions=True -> dividendos na mesma chamada).
+    Se a FMP estiver saudável, nenhuma chamada é feita.
+    Se o download falhar, os acessos relançam o erro (o circuit breaker do
+    chamador conta a falha; o negative cache não marca "sem dado").
+    """
+
+    def __init__(self, symbols: Iterable[str] = (), period: str = "1y"):
+        self.period = period
+        self._symbols: List[str] = []
+        self._frames: Optional[Dict[str, pd.DataFrame]] = None
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self.add(*symbols)
+
+    @staticmethod
+    def _norm(sym: str) -> str:
+        return (sym or "").strip().upper()
+
+    def add(self, *symbols: str) -> None:
+        with self._lock:
+            for s in map(self._norm, symbols):
+                if s and s not in self._symbols:
+                    self._symbols.append(s)
+
+    def _download(self, symbols: List[str]) -> Dict[str, pd.DataFrame]:
+        raw = yf.download(
+            tickers=" ".join(symbols), period=self.period, interval="1d",
+            auto_adjust=True, actions=True, group_by="ticker",
+            threads=True, progress=False,
+        )
+        frames: Dict[str, pd.DataFrame] = {}
+        if raw is None or raw.empty:
+            return frames
+        if getattr(raw.index, "tz", None) is not None:
+            raw.index = raw.index.tz_localize(None)
+        if isinstance(raw.columns, pd.MultiIndex):
+            for sym in raw.columns.get_level_values(0).unique():
+                df = raw[sym].dropna(how="all")
+                if "Close" in df and df["Close"].notna().any():
+                    frames[self._norm(sym)] = df
+        elif len(symbols) == 1 and "Close" in raw:
+            frames[symbols[0]] = raw.dropna(how="all")
+        return frames
+
+    def _load(self, sym: str) -> Dict[str, pd.DataFrame]:
+        with self._lock:
+            if sym and sym not in self._symbols:
+                if self._frames is not None:
+                    # símbolo novo depois do lote: baixa só ele e agrega
+                    self._symbols.append(sym)
+                    self._frames.update(self._download([sym]))
+                    return self._frames
+                self._symbols.append(sym)
+            if self._frames is None and self._error is None:
+                try:
+                    self._frames = self._download(list(self._symbols))
+                    log.info("[YAHOO] lote: %d/%d símbolos com dados", len(self._frames), len(self._symbols))
+                except Exception as e:
+                    log.warning("[YAHOO] download em lote falhou (%d símbolos): %s", len(self._symbols), e)
+                    self._error = e
+            if self._error is not None:
+                raise self._error
+            return self._frames
+
+    def history(self, symbol: str) -> pd.DataFrame:
+        """OHLC diário (ajustado) + Dividends/Stock Splits do símbolo; vazio se o Yahoo não tiver."""
+        sym = self._norm(symbol)
+        df = self._load(sym).get(sym)
+        return df if df is not None else pd.DataFrame()
+
+    def last_close(self, symbol: str) -> Optional[float]:
+        df = self.history(symbol)
+        if df.empty or "Close" not in df:
+            return None
+        s = df["Close"].dropna()
+        return float(s.iloc[-1]) if not s.empty else None
+
+    def dividends(self, symbol: str) -> pd.Series:
+        df = self.history(symbol)
+        if df.empty or "Dividends" not in df:
+            return pd.Series(dtype=float)
+        dv = df["Dividends"].fillna(0.0)
+        return dv[dv > 0]
@@ -0,0 +1,56 @@
+# tests/test_assembleia_prep.py
+import pytest
+
+from src.services.carteiras.assembleia import prep
+
+class FakeFetchEquity:
+    """fetch_equity sem rede: preço fixo, registra cada busca."""
+
+    def __init__(self, price: float = 10.0):
+        self.price = price
+        self.calls = []
+
+    def __call__(self, symbol, quantity, *, is_etf=False, target_price=None, vr=None, **_):
+        self.calls.append((symbol, is_etf))
+        return {
+            "symbol": symbol, "unit_price": self.price, "quantity": float(quantity),
+            "investment": self.price * float(quantity), "score": "–",
+            "target_price": target_price, "targetPrice": target_price,
+            "vp": (target_price / self.price - 1.0) * 100.0 if target_price else None,
+            "vr": vr, "chart": "chart.png",
+        }
+
+@pytest.fixture
+def fake_equity(monkeypatch):
+    fake = FakeFetchEquity()
+    monkeypatch.setattr(prep, "fetch_equity", fake)
+    monkeypatch.setattr(prep, "prefetch_quotes", lambda *a, **k: {})
+    monkeypatch.setattr(prep, "prefetch_crypto_prices", lambda *a, **k: {})
+    monkeypatch.setattr(prep, "prefetch_targets", lambda *a, **k: {"AAPL": 12.0})
+    monkeypatch.setattr(prep, "prefetch_vr", lambda *a, **k: {"AAPL": 1.5})
+    return fake
+
+def test_mesmo_ticker_em_dois_buckets_busca_uma_vez(fake_equity):
+    payload = {
+        "stocks_mod": [{"symbol": "AAPL", "quantity": 2, "score": "A"}],
+        "stocks_arj": [{"symbol": "aapl", "quantity": 5, "target_price": 20, "vr": 3}],
+    }
+
+    out = prep.enrich_payload_with_make_report(payload, max_workers=2)
+
+    assert fake_equity.calls == [("AAPL", False)]
+    mod, arj = out["stocks_mod"][0], out["stocks_arj"][0]
+    assert (mod["quantity"], mod["investment"], mod["score"]) == (2.0, 20.0, "A")
+    assert (arj["quantity"], arj["investment"], arj["score"]) == (5.0, 50.0, None)
+    assert (mod["target_price"], mod["vr"]) == (12.0, 1.5)       # alvo/VR de mercado
+    assert (arj["target_price"], arj["vp"], arj["vr"]) == (20, 100.0, 3)   # do payload
+
+def test_etf_e_acao_do_mesmo_ticker_sao_buscas_distintas(fake_equity):
+    payload = {
+        "etfs_mod": [{"symbol": "SPY", "quantity": 1}],
+        "stocks_mod": [{"symbol": "SPY", "quantity": 1}],
+    }
+
+    prep.enrich_payload_with_make_report(payload, max_workers=2)
+
+    assert sorted(fake_equity.calls) == [("SPY", False), ("SPY", True)]
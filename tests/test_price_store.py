@@ -0,0 +1,86 @@
+# tests/test_price_store.py
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from src.services.carteiras.fmp.store import PriceHistoryStore
+
+TODAY = date.today()
+
+def _day(n: int) -> str:
+    return (TODAY - timedelta(days=n)).isoformat()
+
+class FakeFMP:
+    """fetch_fn que serve um histórico em memória e registra cada consulta."""
+
+    def __init__(self, closes: dict):
+        self.closes = dict(closes)
+        self.calls = []
+
+    def __call__(self, symbol: str, start: str, end: str) -> pd.DataFrame:
+        self.calls.append((start, end))
+        rows = [(d, c) for d, c in sorted(self.closes.items()) if start <= d <= end]
+        return pd.DataFrame({
+            "date": pd.to_datetime([d for d, _ in rows]),
+            "close": [c for _, c in rows],
+            "adjClose": [c for _, c in rows],
+        })
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceHistoryStore(str(tmp_path / "prices.sqlite3"), refresh_seconds=0)
+
+# ---------- Barra do dia (pregão aberto) ----------
+def test_barra_de_hoje_mudando_nao_conta_como_reajuste(store):
+    fmp = FakeFMP({_day(0): 10.0})
+    store.daily("AAA", _day(0), _day(0), fmp)
+    fmp.closes[_day(0)] = 11.0
+    fmp.calls.clear()
+
+    df = store.daily("AAA", _day(0), _day(0), fmp)
+
+    assert fmp.calls == [(_day(0), _day(0))]
+    assert df["close"].tolist() == [11.0]
+
+def test_refresh_do_dia_sobrepoe_so_a_ultima_barra_fechada(store):
+    fmp = FakeFMP({_day(n): 100.0 - n for n in range(10)})
+    store.daily("AAA", _day(9), _day(0), fmp)
+    fmp.closes[_day(0)] += 5
+    fmp.calls.clear()
+
+    df = store.daily("AAA", _day(9), _day(0), fmp)
+
+    assert fmp.calls == [(_day(1), _day(0))]
+    assert df["close"].iloc[-1] == 105.0
+
+def test_reajuste_de_barra_fechada_rebaixa_a_janela(store):
+    fmp = FakeFMP({_day(n): 100.0 - n for n in range(10)})
+    store.daily("AAA", _day(9), _day(0), fmp)
+    fmp.closes = {d: c / 2 for d, c in fmp.closes.items()}   # split novo reajusta o passado
+    fmp.calls.clear()
+
+    df = store.daily("AAA", _day(9), _day(0), fmp)
+
+    assert fmp.calls == [(_day(1), _day(0)), (_day(9), _day(0))]
+    assert df["close"].iloc[0] == pytest.approx(45.5)
+
+# ---------- Datas sem barra ----------
+def test_fim_sem_barra_respeita_refresh_seconds(tmp_path):
+    store = PriceHistoryStore(str(tmp_path / "prices.sqlite3"), refresh_seconds=3600)
+    fmp = FakeFMP({_day(n): 50.0 for n in range(3, 10)})   # fds/feriado: nada depois de D-3
+    store.daily("AAA", _day(9), _day(0), fmp)
+    fmp.calls.clear()
+
+    store.daily("AAA", _day(9), _day(0), fmp)
+
+    assert fmp.calls == []
+
+def test_inicio_antes_da_listagem_nao_e_repedido(store):
+    fmp = FakeFMP({_day(n): 20.0 for n in range(3, 8)})  # listado há 7 dias
+    store.daily("AAA", _day(30), _day(3), fmp)
+    fmp.calls.clear()
+
+    store.daily("AAA", _day(29), _day(3), fmp)
+
+    assert fmp.calls == []
@@ -0,0 +1,73 @@
+# tests/test_vr_utils.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services.carteiras.metrics.vr_utils import backadjust_adjclose
+
+# ---------- Referência (implementação anterior, com iterrows) ----------
+def _backadjust_iterrows(df_price: pd.DataFrame, df_splits: pd.DataFrame) -> pd.Series:
+    if "adjClose" in df_price.columns and df_price["adjClose"].notna().any():
+        return df_price["adjClose"].astype(float)
+    if df_price.empty:
+        return pd.Series(dtype=float)
+    adj = df_price["close"].astype(float).copy()
+    if not df_splits.empty:
+        for _, row in df_splits.dropna(subset=["ratio_float"]).iterrows():
+            ratio = float(row["ratio_float"])
+            if ratio <= 0 or np.isnan(ratio):
+                continue
+            d = row["date"]
+            adj.loc[df_price["date"] < d] *= (1.0 / ratio)
+    return adj
+
+# ---------- Helpers ----------
+def _prices(dates, with_adj: bool = False) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "date": pd.to_datetime(dates),
+        "close": np.linspace(100.0, 50.0, len(dates)),
+    })
+    if with_adj:
+        df["adjClose"] = np.nan
+    return df
+
+def _splits(rows) -> pd.DataFrame:
+    return pd.DataFrame(
+        {"date": pd.to_datetime([d for d, _ in rows]), "ratio_float": [r for _, r in rows]},
+        columns=["date", "ratio_float"],
+    )
+
+DAYS = pd.date_range("2024-01-01", "2024-03-31", freq="B").strftime("%Y-%m-%d").tolist()
+
+CASES = {
+    "sem_splits": (DAYS, []),
+    "ordenados": (DAYS, [("2024-01-15", 2.0), ("2024-02-20", 4.0)]),
+    "desordenados": (DAYS, [("2024-03-01", 3.0), ("2024-01-10", 2.0), ("2024-02-05", 0.5)]),
+    "datas_duplicadas": (DAYS, [("2024-02-01", 2.0), ("2024-02-01", 5.0), ("2024-01-20", 2.0)]),
+    "ratio_nan": (DAYS, [("2024-01-15", np.nan), ("2024-02-15", 2.0)]),
+    "ratio_zero_e_negativo": (DAYS, [("2024-01-15", 0.0), ("2024-02-15", -2.0), ("2024-03-15", 10.0)]),
+    "so_invalidos": (DAYS, [("2024-01-15", 0.0), ("2024-02-15", np.nan)]),
+    "split_no_dia_de_pregao": (DAYS, [(DAYS[10], 2.0)]),
+    "split_fora_da_janela": (DAYS, [("2023-06-01", 2.0), ("2024-06-01", 3.0)]),
+    "precos_desordenados": (DAYS[::-1], [("2024-01-15", 2.0), ("2024-02-20", 4.0)]),
+}
+
+# ---------- Testes ----------
+@pytest.mark.parametrize("with_adj", [False, True], ids=["sem_adjClose", "adjClose_vazio"])
+@pytest.mark.parametrize("name", list(CASES))
+def test_backadjust_bate_com_iterrows(name, with_adj):
+    dates, rows = CASES[name]
+    df_price, df_splits = _prices(dates, with_adj), _splits(rows)
+    got = backadjust_adjclose(df_price, df_splits)
+    expected = _backadjust_iterrows(df_price, df_splits)
+    pd.testing.assert_series_equal(got, expected, check_names=False, rtol=1e-12)
+
+def test_backadjust_usa_adjclose_quando_existe():
+    df_price = _prices(DAYS)
+    df_price["adjClose"] = df_price["close"] / 2
+    got = backadjust_adjclose(df_price, _splits([("2024-02-01", 2.0)]))
+    pd.testing.assert_series_equal(got, df_price["adjClose"].astype(float))
+
+def test_backadjust_precos_vazios():
+    empty = pd.DataFrame({"date": pd.to_datetime([]), "close": []})
+    assert backadjust_adjclose(empty, _splits([("2024-02-01", 2.0)])).empty